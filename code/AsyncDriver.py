@@ -0,0 +1,138 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains an asyncio driver, which runs several simulations in
+    one process with labelled TraCI connections (one SUMO instance each). The
+    simulations are stepped interleaved: while SUMO computes the step of one
+    simulation (a blocking socket wait, moved to a thread), the controllers
+    of the other simulations run. The state of every simulation is kept in
+    its SimulationContext, the global random generators are swapped per
+    simulation, so results are the same as when run one after another.
+    Requires the traci backend (libsumo runs a single simulation per process).
+
+    Usage: python AsyncDriver.py [--controller SCOSCA] [--concurrency 4] [--seeds 41 42 ...]
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import sys
+import time
+import random
+import asyncio
+import argparse
+import concurrent.futures
+import numpy as np
+
+
+
+
+# #############################################################################
+# ###### DRIVER PARAMETER #####################################################
+# #############################################################################
+ASYNC_CONCURRENCY = 4 # Simulations stepped concurrently in one process
+    # Parameters For SCOSCA (see README.md)
+PARAMS = (46.71, 6.62, 0.79, 0.24, 0.14, -1, -1, -1)
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+async def run_simulation_async(job, label, semaphore):
+    """
+    Runs one simulation job (controller, params, seed) on its own labelled
+    connection and returns its metrics.
+    """
+    import traci
+    import Profiler
+    from RunSimulation import simulate, get_result_cache_file, print_metrics
+    from ResultCache import load_result, save_result
+    from SimulationContext import SimulationContext
+    controller, params, seed = job
+    ctx = SimulationContext(controller, label)
+    # Consult the result cache
+    result_file = get_result_cache_file((seed,) + tuple(params), ctx)
+    metrics = load_result(result_file) if result_file is not None else None
+    if metrics is not None:
+        print(f">> Result from cache: {result_file}", file=sys.stderr, flush=True)
+        print_metrics(metrics)
+        return metrics
+    async with semaphore:
+        steps = simulate((seed,) + tuple(params), ctx)
+        rng_states = None
+        while True:
+            # Resume this simulation (its connection and random generators)
+            if ctx.startup_mode is not None:
+                traci.switch(label)
+            if rng_states is not None:
+                random.setstate(rng_states[0])
+                np.random.set_state(rng_states[1])
+            Profiler.activate(ctx.profiler)
+            try:
+                n_steps = next(steps)
+            except StopIteration as stop:
+                if result_file is not None:
+                    save_result(result_file, stop.value)
+                return stop.value
+            rng_states = (random.getstate(), np.random.get_state())
+            # Wait for SUMO while the other simulations continue
+            connection = traci.getConnection(label)
+            for n in range(0, n_steps):
+                await asyncio.to_thread(connection.simulationStep)
+
+
+async def run_jobs_async(jobs, concurrency):
+    """
+    Runs all jobs with at most concurrency simulations at a time.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[run_simulation_async(job, f"sim_{i}", semaphore) for i, job in enumerate(jobs)])
+
+
+def run_jobs(jobs, concurrency=ASYNC_CONCURRENCY):
+    """
+    Runs the jobs [(controller, params, seed), ...] in this process and
+    returns their metrics in order.
+    """
+    import traci
+    if traci.isLibsumo():
+        raise RuntimeError("The asyncio driver requires the traci backend (SUMO_BACKEND=traci)")
+    return asyncio.run(run_jobs_async(jobs, concurrency))
+
+
+
+
+# #############################################################################
+# ###### MAIN CODE ############################################################
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--controller", default="SCOSCA")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[41, 42, 43, 44])
+    args = parser.parse_args()
+    sys.argv = sys.argv[:1]
+    
+    start = time.perf_counter()
+    results = run_jobs([(args.controller, PARAMS, seed) for seed in args.seeds], args.concurrency)
+    duration = time.perf_counter() - start
+    print("\n=== Async Driver ===")
+    for seed, result in zip(args.seeds, results):
+        print(f"Seed {seed}: Gini Total {result[9]:.3f}, Avg Delay {result[4]:.2f} sec")
+    print(f"{len(results)} simulations ({args.concurrency} concurrent) in {duration:.1f} sec", flush=True)
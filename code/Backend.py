@@ -0,0 +1,76 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script selects the SUMO backend: either the "traci" socket client to
+    a separate SUMO process, or "libsumo" running SUMO in-process (no socket
+    communication). It has to be imported before any module imports traci.
+    The backend is chosen with the environment variable SUMO_BACKEND, libsumo
+    cannot show the GUI, so traci is used whenever SUMO_BINARY is sumo-gui.
+    The binary a simulation is actually started with (RunSimulation.SUMO_BINARY)
+    is checked against the selected backend with check_backend.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import sys
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def is_gui_binary(sumo_binary):
+    """
+    Checks whether the SUMO binary is the GUI version.
+    """
+    return "sumo-gui" in os.path.basename(sumo_binary)
+
+
+def select_backend(backend, sumo_binary=""):
+    """
+    Selects the backend used by "import traci", returns the selected backend.
+    """
+    if backend == "libsumo" and not is_gui_binary(sumo_binary):
+        os.environ["LIBSUMO_AS_TRACI"] = "quiet"
+        return "libsumo"
+    if backend == "libsumo":
+        print(">> libsumo has no GUI, falling back to traci", file=sys.stderr, flush=True)
+    os.environ.pop("LIBSUMO_AS_TRACI", None)
+    return "traci"
+
+
+def check_backend(backend, sumo_binary, is_libsumo):
+    """
+    Checks that the selected backend is the one "import traci" loaded
+    (is_libsumo) and that it can run the SUMO binary, raises a RuntimeError
+    otherwise.
+    """
+    if (backend == "libsumo") != is_libsumo:
+        raise RuntimeError(f"SUMO backend {backend} selected, but traci was imported before Backend.py")
+    if backend == "libsumo" and is_gui_binary(sumo_binary):
+        raise RuntimeError(f"libsumo has no GUI and cannot run {sumo_binary}, "
+                           "set SUMO_BINARY in the environment or SUMO_BACKEND=traci")
+
+
+
+
+# #############################################################################
+# ###### BACKEND SELECTION ####################################################
+# #############################################################################
+SUMO_BACKEND = select_backend(os.environ.get("SUMO_BACKEND", "traci"),  # traci, libsumo
+                              os.environ.get("SUMO_BINARY", ""))
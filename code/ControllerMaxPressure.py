@@ -21,7 +21,10 @@
 # #############################################################################
 import traci
 import random
-import pandas as pd
+import numpy as np
+from scipy import sparse
+from Profiler import profiled
+from StateEngine import EXCLUDED_EDGES
 
 
 
@@ -35,10 +38,6 @@ G_T_MIN = 5 #Min Greentime (used for Max. Pressure)
 G_T_MAX = 50 #Max Greentime (used for Max. Pressure)
 WEIGHTS_MAX_PRESSURE = {"car": 1.0, "moc": 1.0, "lwt": 1.0, "hwt": 1.0, "bus": 1.0}
 
-global df_current_status, df_hidden_vehicles
-df_current_status = None
-df_hidden_vehicles = None
-
 
 
 
@@ -58,9 +57,17 @@ class MaxPressure_SignalController:
         self.pressures = []
         self.multiplier = multiplier
         
-    def do_signal_logic(self):
+    def needs_observation(self):
+        """
+        Whether the next tick reads the pressures (only when checking the
+        pressures or choosing the next phase).
+        """
+        return self.current_state in ["check_pressures", "next_phase"]
+        
+    def do_signal_logic(self, link_pressures):
         self.timer += 1
-        self.determine_pressures()
+        if self.needs_observation():
+            self.determine_pressures(link_pressures)
         if self.current_state == "start":
             if self.timer==G_T_MIN:
                 self.current_state="check_pressures"
@@ -109,75 +116,105 @@ class MaxPressure_SignalController:
             print("")
         self.set_signal_on_traffic_lights()
             
-    def determine_pressures(self):
-        if df_current_status is None:
+    @profiled("MaxPressure_SignalController.determine_pressures")
+    def determine_pressures(self, link_pressures):
+        """
+        Takes the pressures of the links of this intersection from the
+        pressures of all links (see PressureIncidence).
+        """
+        if link_pressures is None:
             self.pressures = [0 for p in self.links]
             return
-        self.pressures = []
-        for link in self.links:
-            lanes = self.links[link]
-            df_vehicles = []
-            # based on lane
-            if type(df_vehicles)==list:
-                df_vehicles = df_current_status[df_current_status["lane"].isin(lanes)]
-            else:
-                df_vehicles = pd.concat((df_vehicles, df_current_status[df_current_status["lane"].isin(lanes)]))
-            # based on hidden on intersection
-            edges = [l.split("_")[0] for l in lanes]
-            hits = df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)]
-            if len(hits)>0:
-                if type(df_vehicles)==list:
-                    df_vehicles = df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)]
-                else:
-                    df_vehicles = pd.concat((df_vehicles, df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)][["veh_id", "lane", "class", "weight"]]))
-            pressure = 0 
-            if len(df_vehicles)>0:
-                pressure = sum(df_vehicles["weight"])
-            # multiplier
-            if self.multiplier is not None:
-                if link in self.multiplier:
-                    pressure *= self.multiplier[link]
-            self.pressures.append(pressure)
+        self.pressures = link_pressures[self.link_rows].tolist()
     
     def set_signal_on_traffic_lights(self):
         traci.trafficlight.setPhase(self.intersection_name, self.current_phase)
 
-controller1 = MaxPressure_SignalController(
-    intersection_name = "intersection1",
-    phases = [0, 2, 4],
-    links = {0:["921020465#1_3", "921020465#1_2", "921020464#0_1", "921020464#1_1", "38361907_3", "38361907_2", "-1164287131#1_3", "-1164287131#1_2"], 
-             2:["-1169441386_2", "-1169441386_1", "-331752492#1_2", "-331752492#1_1", "-331752492#0_1", "-331752492#0_2"], 
-             4:["-183419042#1_1", "26249185#30_1", "26249185#30_2", "26249185#1_1", "26249185#1_2"]},
-    )
-
-controller2 = MaxPressure_SignalController(
-    intersection_name = "intersection2",
-    phases = [0, 2, 4],
-    links = {0:["183049933#0_1", "-38361908#1_1"], 
-             2:["-38361908#1_1", "-38361908#1_2"], 
-             4:["-25973410#1_1", "758088375#0_1", "758088375#0_2"]}
-    )
-
-controller3 = MaxPressure_SignalController(
-    intersection_name = "intersection3",
-    phases = [0, 2, 4],
-    links = {0:["E3_1", "-758088377#1_1", "-758088377#1_2", "-E1_1", "-E1_2"], 
-             2:["E3_1", "E3_2"], 
-             4:["-758088377#1_1", "-E1_1", "-E4_1", "-E4_2"]}
-    )
-
-controller4 = MaxPressure_SignalController(
-    intersection_name = "intersection4",
-    phases = [0, 2],
-    links = {0:["22889927#0_1", "758088377#2_1", "-22889927#2_1"], 
-             2:["-25576697#0_0"]}
-    )
-
-controller5 = MaxPressure_SignalController(
-    intersection_name = "intersection5",
-    phases = [0, 2, 4],
-    links = {0:["E6_1", "E6_2", "E5_1", "130569446_1", "E15_1", "E15_2"], 
-             2:["E15_2", "E6_3", "E5_2", "130569446_2"],
-             4:["E10_1", "E9_1",  "1162834479#1_1", "-208691154#0_1", "-208691154#1_1"]},
-    )
-signal_controllers = [controller1, controller2, controller3, controller4, controller5]
\ No newline at end of file
+
+class PressureIncidence:
+    """
+    Lane-to-link incidence of all Max Pressure controllers. Lanes and the
+    internal edges of their edges (hidden vehicles, "@edge") are indexed once,
+    so that the pressures of all links are one weighted vehicle count per lane
+    (np.bincount) and one sparse matrix product per step. Link multipliers
+    are part of the matrix.
+    """
+    def __init__(self, controllers):
+        self.lane_index = {}
+        rows, columns, values = [], [], []
+        self.n_links = 0
+        for controller in controllers:
+            controller.link_rows = np.arange(self.n_links, self.n_links + len(controller.links))
+            self.n_links += len(controller.links)
+            for row, link in zip(controller.link_rows, controller.links):
+                lanes = controller.links[link]
+                # Vehicles on the lanes, and hidden vehicles on the internal lanes of their edges
+                keys = list(dict.fromkeys(lanes))
+                keys += list(dict.fromkeys("@"+lane.split("_")[0] for lane in lanes if lane.split("_")[0] not in EXCLUDED_EDGES))
+                multiplier = 1.0
+                if controller.multiplier is not None and link in controller.multiplier:
+                    multiplier = controller.multiplier[link]
+                for key in keys:
+                    rows.append(row)
+                    columns.append(self.lane_index.setdefault(key, len(self.lane_index)))
+                    values.append(multiplier)
+        self.matrix = sparse.csr_matrix((values, (rows, columns)), shape=(self.n_links, len(self.lane_index)))
+
+    def link_pressures(self, df_current_status):
+        """
+        Returns the pressures of all links (weighted vehicle counts), None if
+        there are no vehicles.
+        """
+        if df_current_status is None:
+            return None
+        positions = df_current_status["lane"].map(self.lane_index).to_numpy()
+        known = ~np.isnan(positions)
+        counts = np.bincount(positions[known].astype(np.int64), weights=df_current_status["weight"].to_numpy()[known],
+                             minlength=len(self.lane_index))
+        return self.matrix @ counts
+
+
+def create_signal_controllers():
+    """
+    Creates the Max Pressure controllers of all junctions (new controllers for
+    every simulation run).
+    """
+    controller1 = MaxPressure_SignalController(
+        intersection_name = "intersection1",
+        phases = [0, 2, 4],
+        links = {0:["921020465#1_3", "921020465#1_2", "921020464#0_1", "921020464#1_1", "38361907_3", "38361907_2", "-1164287131#1_3", "-1164287131#1_2"], 
+                 2:["-1169441386_2", "-1169441386_1", "-331752492#1_2", "-331752492#1_1", "-331752492#0_1", "-331752492#0_2"], 
+                 4:["-183419042#1_1", "26249185#30_1", "26249185#30_2", "26249185#1_1", "26249185#1_2"]},
+        )
+
+    controller2 = MaxPressure_SignalController(
+        intersection_name = "intersection2",
+        phases = [0, 2, 4],
+        links = {0:["183049933#0_1", "-38361908#1_1"], 
+                 2:["-38361908#1_1", "-38361908#1_2"], 
+                 4:["-25973410#1_1", "758088375#0_1", "758088375#0_2"]}
+        )
+
+    controller3 = MaxPressure_SignalController(
+        intersection_name = "intersection3",
+        phases = [0, 2, 4],
+        links = {0:["E3_1", "-758088377#1_1", "-758088377#1_2", "-E1_1", "-E1_2"], 
+                 2:["E3_1", "E3_2"], 
+                 4:["-758088377#1_1", "-E1_1", "-E4_1", "-E4_2"]}
+        )
+
+    controller4 = MaxPressure_SignalController(
+        intersection_name = "intersection4",
+        phases = [0, 2],
+        links = {0:["22889927#0_1", "758088377#2_1", "-22889927#2_1"], 
+                 2:["-25576697#0_0"]}
+        )
+
+    controller5 = MaxPressure_SignalController(
+        intersection_name = "intersection5",
+        phases = [0, 2, 4],
+        links = {0:["E6_1", "E6_2", "E5_1", "130569446_1", "E15_1", "E15_2"], 
+                 2:["E15_2", "E6_3", "E5_2", "130569446_2"],
+                 4:["E10_1", "E9_1",  "1162834479#1_1", "-208691154#0_1", "-208691154#1_1"]},
+        )
+    return [controller1, controller2, controller3, controller4, controller5]
@@ -10,7 +10,8 @@
 
 """
     This script contains the implementation of the SCOOTS/SCATS (SCOSCA) traffic
-    light controller.
+    light controller. It is the core of the FairSCOSCA_1 and FairSCOSCA_2
+    controllers, which plug in their penalty and early-termination hooks.
 """
 
 
@@ -20,7 +21,8 @@
 # ###### IMPORTS ##############################################################
 # #############################################################################
 import traci
-from traci import tc
+import numpy as np
+from Profiler import profiled
 
 
 
@@ -29,21 +31,6 @@ from traci import tc
 # ###### GLOBAL VARIABLES #####################################################
 # #############################################################################
 
-    # Tracks how often traffic lights get updated
-update_counter = 0
-    # Tracks the previous cycle length (used for proportional adjustments)
-prev_cycle_length = {"intersection1": 81,
-                     "intersection2": 81,
-                     "intersection3": 81,
-                     "intersection4": 84,
-                     "intersection5": 81}
-    # Offset timings between junctions (used for green wave coordination)
-offsets = {}
-    # Caching and helper structures
-most_congested_edge = {}
-most_congested_lane = {}
-downstream_junction_map = {}
-estimated_travel_time = {}
     # Save Green and Yellow states
 green_states = {
     "intersection1": ["GGrrGrr", "rrGGrrr", "rrrrrGG"],
@@ -112,65 +99,137 @@ def optimize_cycle_length(degree_of_sat, cycle_length, adaptation_factor):
 # #############################################################################
 # ## GREEN PHASE OPTIMIZER
 # #############################################################################
-def optimize_green_phases(queue_lengths, degree_of_sat, cycle_length,greentimes, adaptation_factor, threshold):
+class PhaseIncidence:
     """
-    2. Optimize green phase duration per junction
+    Lane-to-phase incidence of all SCOSCA junctions. The lanes of
+    phases_per_junction are indexed once (one row per junction and lane, one
+    column per green phase), so that the max-DS lanes, the excluded lanes and
+    the DS and waiting time maxima per phase of all junctions are masked
+    reductions over arrays.
     """
-    global prev_cycle_length
+    def __init__(self, phases_per_junction):
+        self.junction_index = {junction: k for k, junction in enumerate(phases_per_junction)}
+        self.n_phases = max(phase for phases in phases_per_junction.values() for phase in phases)//2 + 1
+        self.rows = {}
+        row_junction = []
+        for junction, phases in phases_per_junction.items():
+            for lanes in phases.values():
+                for lane in lanes:
+                    if (junction, lane) not in self.rows:
+                        self.rows[junction, lane] = len(row_junction)
+                        row_junction.append(self.junction_index[junction])
+        self.row_junction = np.array(row_junction, dtype=int)
+        self.served = np.zeros((len(self.rows), self.n_phases), dtype=bool)
+        for junction, phases in phases_per_junction.items():
+            for phase, lanes in phases.items():
+                for lane in lanes:
+                    self.served[self.rows[junction, lane], phase//2] = True
+
+    def lane_values(self, values):
+        """
+        Returns the values {junction: {lane: value}} per row (0 if missing).
+        """
+        return np.array([values[junction].get(lane, 0) if junction in values else 0
+                         for junction, lane in self.rows], dtype=float)
+
+    def max_lanes(self, degree_of_sat, junctions):
+        """
+        Returns the lane with the highest DS of every junction (the first one
+        in the order of degree_of_sat if several are equal).
+        """
+        lanes = [lane for junction in junctions for lane in degree_of_sat[junction]]
+        ds = np.array([value for junction in junctions for value in degree_of_sat[junction].values()], dtype=float)
+        segment = np.repeat(np.arange(len(junctions)), [len(degree_of_sat[junction]) for junction in junctions])
+        ds_max = np.full(len(junctions), -np.inf)
+        np.fmax.at(ds_max, segment, ds)
+        is_max = np.flatnonzero(ds == ds_max[segment])
+        first = is_max[np.unique(segment[is_max], return_index=True)[1]]
+        return {junction: lanes[i] for junction, i in zip(junctions, first)}
+
+    def excluded_lanes(self, max_lanes):
+        """
+        Returns the phases serving the max-DS lane per junction and the rows
+        of all lanes in these phases (excluded from the other phases).
+        """
+        with_max_lane = np.zeros((len(self.junction_index), self.n_phases), dtype=bool)
+        for junction, lane in max_lanes.items():
+            if (junction, lane) in self.rows:
+                with_max_lane[self.junction_index[junction]] = self.served[self.rows[junction, lane]]
+        excluded = (self.served & with_max_lane[self.row_junction]).any(axis=1)
+        return with_max_lane, excluded
+
+    def phase_maxima(self, lane_values, excluded):
+        """
+        Returns the maximum value over the lanes of every phase that are not
+        excluded, per junction and phase (0 if there is no such lane).
+        """
+        masked = np.where(self.served & ~excluded[:, None], lane_values[:, None], -np.inf)
+        maxima = np.full((len(self.junction_index), self.n_phases), -np.inf)
+        np.maximum.at(maxima, self.row_junction, masked)
+        return np.where(np.isneginf(maxima), 0, maxima)
+
+
+@profiled("optimize_green_phases")
+def optimize_green_phases(ctx, queue_lengths, degree_of_sat, cycle_length,greentimes, adaptation_factor, threshold,
+                          waiting_times=None, penalty=None):
+    """
+    2. Optimize green phase duration per junction. A penalty hook (fairness
+    variants) receives the waiting time maxima of the other phases and
+    returns the adjustments of the max-DS and second phase, which then never
+    shorten these phases.
+    """
+    prev_cycle_length = ctx.prev_cycle_length
+    incidence = ctx.phase_incidence
+    # Max-DS lanes, excluded lanes and phase maxima of all junctions
+    max_lanes = incidence.max_lanes(degree_of_sat, list(greentimes.keys()))
+    with_max_lane, excluded = incidence.excluded_lanes(max_lanes)
+    phase_ds = incidence.phase_maxima(incidence.lane_values(degree_of_sat), excluded)
+    if waiting_times is not None:
+        phase_waiting = incidence.phase_maxima(incidence.lane_values(waiting_times), excluded)
     for junction in greentimes.keys():
         greens = greentimes[junction]
         effective_cycle = cycle_length - 3*(len(greens))  # Subtract yellow phases
         # Get the lane with the highest degree of saturation
-        max_lane = max(degree_of_sat[junction], key=degree_of_sat[junction].get)
+        max_lane = max_lanes[junction]
         max_queue = queue_lengths[junction][max_lane]
         max_ds = degree_of_sat[junction][max_lane]
         if max_queue > threshold:
-            # Identify all phases where max_lane appears
-            phases_with_max_lane = [
-                p for p, lane_list in phases_per_junction[junction].items()
-                if max_lane in lane_list
-            ]
-            # Determine the phase of max_lane
-            if len(phases_with_max_lane) == 1:
-                max_phase = phases_with_max_lane[0]//2
-            else:
-                max_phase = 0  # fallback if lane is used in multiple phases
-            # Collect all lanes in those phases (to exclude them)
-            excluded_lanes = set()
-            for p in phases_with_max_lane:
-                excluded_lanes.update(phases_per_junction[junction][p])
-            # Get DS per other phase (not containing max_lane)
-            phase_ds_list = []
-            for phase in range(len(greens)):
-                if phase == max_phase:
-                    continue
-                lanes = phases_per_junction[junction][phase * 2]
-                phase_lanes = [l for l in lanes if l not in excluded_lanes]
-                if phase_lanes:
-                    ds_val = max([degree_of_sat[junction].get(l, 0) for l in phase_lanes])
-                else:
-                    ds_val = 0
-                phase_ds_list.append((phase, ds_val))
-            #Sort DS
-            phase_ds_sorted = sorted(phase_ds_list, key=lambda x: x[1], reverse=True)
-            second_phase = phase_ds_sorted[0][0]
-            second_ds = phase_ds_sorted[0][1]
-            third_phase = phase_ds_sorted[1][0] if len(phase_ds_sorted) > 1 else None
-            third_ds = phase_ds_sorted[1][1] if len(phase_ds_sorted) > 1 else second_ds
+            k = incidence.junction_index[junction]
+            # Determine the phase of max_lane (fallback if lane is used in multiple phases)
+            max_phase = int(np.argmax(with_max_lane[k])) if with_max_lane[k].sum() == 1 else 0
+            # Sort DS of the other phases (not containing max_lane)
+            other_phases = [phase for phase in range(len(greens)) if phase != max_phase]
+            phase_ds_sorted = sorted(other_phases, key=lambda phase: phase_ds[k, phase], reverse=True)
+            second_phase = phase_ds_sorted[0]
+            second_ds = phase_ds[k, second_phase]
+            third_phase = phase_ds_sorted[1] if len(phase_ds_sorted) > 1 else None
+            third_ds = phase_ds[k, third_phase] if len(phase_ds_sorted) > 1 else second_ds
             # Compute DS differences
             ds_diff_max = max(0, max_ds - third_ds)
             ds_diff_second = max(0, second_ds - third_ds)
-            greentimes[junction][max_phase] = int(min(3 * effective_cycle / 4,
-                                                    greentimes[junction][max_phase] + ds_diff_max * adaptation_factor))
+            if penalty is None:
+                greentimes[junction][max_phase] = int(min(3 * effective_cycle / 4,
+                                                        greentimes[junction][max_phase] + ds_diff_max * adaptation_factor))
+            else:
+                adjust, adjust2 = penalty(junction, max_lane, cycle_length, ds_diff_max, ds_diff_second,
+                                          phase_waiting[k, other_phases])
+                greentimes[junction][max_phase] = int(min(3 * effective_cycle / 4,
+                                                        max(greentimes[junction][max_phase],
+                                                            greentimes[junction][max_phase] + adjust * adaptation_factor)))
             # Assign the remaining green time
-            remaining_time = effective_cycle - greentimes[junction][max_phase]           
+            remaining_time = effective_cycle - greentimes[junction][max_phase]
             if len(greens) == 2:
                 # Only one other phase — assign remaining time to it
                 greentimes[junction][second_phase] = remaining_time
             elif len(greens) == 3:
                 # Determine saturation levels for the two remaining phases
-                greentimes[junction][second_phase] = int(min(2*remaining_time/3, greentimes[junction][second_phase]+ds_diff_second*adaptation_factor))
-                greentimes[junction][third_phase] = remaining_time - greentimes[junction][second_phase]               
+                if penalty is None:
+                    greentimes[junction][second_phase] = int(min(2*remaining_time/3, greentimes[junction][second_phase]+ds_diff_second*adaptation_factor))
+                else:
+                    greentimes[junction][second_phase] = int(min(2*remaining_time/3,
+                                                                 max(greentimes[junction][second_phase],
+                                                                     greentimes[junction][second_phase] + adjust2 * adaptation_factor)))
+                greentimes[junction][third_phase] = remaining_time - greentimes[junction][second_phase]
         else:
             # Only scale with cycle length
                 scaled = [int(g * effective_cycle / prev_cycle_length[junction]) for g in greens]
@@ -184,11 +243,12 @@ def optimize_green_phases(queue_lengths, degree_of_sat, cycle_length,greentimes,
 # #############################################################################
 # ## OFFSET OPTIMIZER
 # #############################################################################
-def optimize_offsets(queue_lengths, cycle_length, green_phases, adaptation_factor, threshold):
+@profiled("optimize_offsets")
+def optimize_offsets(ctx, queue_lengths, cycle_length, green_phases, adaptation_factor, threshold):
     """
     3. Optimize offsets to enable green waves
     """
-    global offsets, downstream_junction_map, most_congested_lane, estimated_travel_time
+    offsets = ctx.offsets
     estimated_travel_time = {}
     # Define three traffic districts
     districts = {
@@ -268,66 +328,51 @@ def optimize_offsets(queue_lengths, cycle_length, green_phases, adaptation_facto
 # #############################################################################
 # ## APPLY OFFSETS, GREENPHASES
 # #############################################################################
-def setup_scosca_control(queue_lengths, degree_of_sat, step,
-                             adaptation_cycle, adaptation_green, green_thresh,
-                             adaptation_offset, offset_thresh,
-                             greentimes,cycle_length):
+def apply_signal_plans(ctx, greentimes, termination=None):
     """
-    4. Main function: Apply SCOSCA traffic signal logic
+    Uploads the green phases of every junction (if they changed) and shifts
+    them by the offsets for green wave alignment. An early-termination hook
+    (FairSCOSCA_2) is called per junction with the offset and the phase set.
     """
-    global offsets, update_counter
-    if update_counter % 5 == 0 and update_counter != 0:
-        cycle_length = optimize_cycle_length(degree_of_sat, cycle_length, adaptation_cycle)
-    if update_counter != 0:
-        greentimes = optimize_green_phases(queue_lengths, degree_of_sat, cycle_length,greentimes, adaptation_green, green_thresh)
-    if update_counter % 5 == 0 and update_counter != 0:
-        offsets = optimize_offsets(queue_lengths, cycle_length, greentimes, adaptation_offset, offset_thresh)
-    update_counter += 1
-    # Apply logic to each junction
+    offsets = ctx.offsets
+    ctx.signal_plans.begin_cycle()
     for i, junction in enumerate(greentimes.keys()):
         greens = greentimes[junction]
-        phases = []
-        for idx, g_duration in enumerate(greens):
-            phases.append(traci.trafficlight.Phase(g_duration, green_states[junction][idx]))
-            phases.append(traci.trafficlight.Phase(3, yellow_states[junction][idx]))  # fixed yellow duration
-        logic = traci.trafficlight.Logic(
-            programID=f"program_fixed_{i}",
-            type=tc.TRAFFICLIGHT_TYPE_STATIC,
-            currentPhaseIndex=0,
-            phases=phases
-        )
-        traci.trafficlight.setProgramLogic(junction, logic)
+        ctx.signal_plans.upload(junction, f"program_fixed_{i}", greens, green_states[junction], yellow_states[junction])
         # Apply offsets for green wave alignment
         shift = int(offsets.get(junction, 0))
-        if shift == 0:
-            traci.trafficlight.setPhase(junction, 0)
-        elif shift < 3:
-            traci.trafficlight.setPhase(junction, len(greens)*2-1)
-            traci.trafficlight.setPhaseDuration(junction, shift)
-        elif shift < greens[-1] + 3:
-            traci.trafficlight.setPhase(junction, len(greens)*2-2)
-            traci.trafficlight.setPhaseDuration(junction, shift - 3)
-        elif shift < greens[-1] + 6:
-            traci.trafficlight.setPhase(junction, len(greens)*2-3)
-            traci.trafficlight.setPhaseDuration(junction, shift - greens[-1] - 3)
-        elif shift < greens[-1] + 6 + greens[-2]:
-            traci.trafficlight.setPhase(junction, len(greens)*2-4)
-            traci.trafficlight.setPhaseDuration(junction, shift - greens[-1] - 6)
-        else:
+        phase = ctx.signal_plans.apply_offset(junction, greens, shift)
+        if phase is None:
             if len(greens)*2 > 4:
-                if shift < greens[-1]+9+greens[-2]:
-                    traci.trafficlight.setPhase(junction, len(greens)*2-5)
-                    traci.trafficlight.setPhaseDuration(junction, shift - greens[-1]-greens[-2] - 6)
-                elif shift < greens[-1] + 9 +greens[-2]+greens[-3]:
-                    traci.trafficlight.setPhase(junction, len(greens)*2-6)
-                    traci.trafficlight.setPhaseDuration(junction, shift - greens[-1]-greens[-2] - 9) 
-                else:
-                    print("ERROR1",flush=True)
-                    print(f"offsets: {offsets}",flush=True)
-                    print(f"junction: {junction}",flush=True)
-                    print(f"greens: {greens}",flush=True)
+                print("ERROR1",flush=True)
+                print(f"offsets: {offsets}",flush=True)
+                print(f"junction: {junction}",flush=True)
+                print(f"greens: {greens}",flush=True)
             else:
                 print("ERROR2",flush=True)
                 print(f"offsets: {offsets}",flush=True)
                 print(f"greentimes: {greens}",flush=True)
+        if termination is not None:
+            termination(ctx, junction, greens, shift, phase)
+
+
+def setup_scosca_control(ctx, queue_lengths, degree_of_sat, step,
+                             adaptation_cycle, adaptation_green, green_thresh,
+                             adaptation_offset, offset_thresh,
+                             greentimes,cycle_length,
+                             waiting_times=None, penalty=None, termination=None):
+    """
+    4. Main function: Apply SCOSCA traffic signal logic (the fairness
+    variants pass their waiting times and hooks)
+    """
+    if ctx.update_counter % 5 == 0 and ctx.update_counter != 0:
+        cycle_length = optimize_cycle_length(degree_of_sat, cycle_length, adaptation_cycle)
+    if ctx.update_counter != 0:
+        greentimes = optimize_green_phases(ctx, queue_lengths, degree_of_sat, cycle_length,greentimes, adaptation_green, green_thresh,
+                                           waiting_times, penalty)
+    if ctx.update_counter % 5 == 0 and ctx.update_counter != 0:
+        ctx.offsets = optimize_offsets(ctx, queue_lengths, cycle_length, greentimes, adaptation_offset, offset_thresh)
+    ctx.update_counter += 1
+    # Apply logic to each junction
+    apply_signal_plans(ctx, greentimes, termination)
     return cycle_length, greentimes
@@ -0,0 +1,176 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the demand model: it compiles the vehicle and bus
+    spawn tables into schedules indexed by simulation step (seconds after the
+    simulation start), and into SUMO route files (one per seed) so that SUMO
+    loads the demand natively instead of inserting every vehicle with TraCI.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import hashlib
+from xml.sax.saxutils import quoteattr
+import pandas as pd
+import numpy as np
+
+
+
+
+# #############################################################################
+# ###### DEMAND PARAMETER #####################################################
+# #############################################################################
+    # Increase whenever the generated route files change
+DEMAND_COMPILER_VERSION = 2
+    # Departure of compiled vehicles, the defaults of traci.vehicle.add (SUMO's route file defaults insert faster)
+DEPART_ATTRIBUTES = 'departLane="first" departPos="base" departSpeed="0"'
+VEHICLE_CLASSES = ["car", "moc", "lwt", "hwt"]
+VEHICLE_CLASS_PROBABILITIES = [0.81, 0.082, 0.046, 0.062]
+sumo_vehicle_types = {
+    "car": "sumo_car",
+    "moc": "sumo_motorcycle",
+    "lwt": "sumo_transporter",
+    "hwt": "sumo_truck",
+    "bus": "sumo_bus",
+}
+vehicle_classes_of_types = {v: k for k, v in sumo_vehicle_types.items()}
+
+
+
+
+# #############################################################################
+# ###### SPAWN SCHEDULE #######################################################
+# #############################################################################
+class SpawnSchedule:
+    """
+    Spawn table packed into arrays: the rows of step s are
+    offsets[s] ... offsets[s+1]-1 of routes, counts and stops.
+    """
+    def __init__(self, offsets, routes, counts, stops):
+        self.offsets = offsets
+        self.routes = routes
+        self.counts = counts
+        self.stops = stops
+
+    def rows(self, step):
+        if step < 0 or step >= len(self.offsets)-1:
+            return range(0)
+        return range(self.offsets[step], self.offsets[step+1])
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def get_random_vehicle_class(no_truck=False, rng=np.random):
+    random_vehicle_class = rng.choice(VEHICLE_CLASSES, size=1, p=VEHICLE_CLASS_PROBABILITIES)[0]
+    while no_truck and random_vehicle_class=="hwt":
+        random_vehicle_class = rng.choice(VEHICLE_CLASSES, size=1, p=VEHICLE_CLASS_PROBABILITIES)[0]
+    return random_vehicle_class
+
+
+def determine_whether_truck_banned_route(desired_route):
+    route_entrance = desired_route.split("_")[1]
+    route_exit = desired_route.split("_")[2]
+    selected_entrances = ["E21", "E22", "E24", "E25", "E20", "E3", "E4", "E5", "E1", "E2", "E6", "E7", "E12", "E13"]
+    selected_exits = ["A1", "A2", "A3", "A16", "A18", "A15"]
+    if route_entrance in selected_entrances and route_exit in selected_exits:
+        return False
+    return True
+
+
+def compile_spawn_schedule(spawn_file, start_time, duration):
+    """
+    Compiles a spawn table (csv) into a SpawnSchedule for steps 0...duration.
+    """
+    df_spawn = pd.read_csv(spawn_file)
+    spawn_times = pd.to_datetime(df_spawn["Adjusted_Datetime"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    steps = (spawn_times - pd.Timestamp(start_time)).dt.total_seconds().to_numpy()
+    selected = np.flatnonzero((steps >= 0) & (steps <= duration))
+    selected = selected[np.argsort(steps[selected], kind="stable")]
+    steps = steps[selected].astype(np.int64)
+    offsets = np.zeros(duration+2, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(steps, minlength=duration+1))
+    routes = df_spawn["route"].astype(str).to_numpy()[selected]
+    counts = np.ceil(df_spawn["n_spawn"].to_numpy()[selected]).astype(np.int64)
+    if "Stops" in df_spawn.columns:
+        stops = df_spawn["Stops"].astype(str).to_numpy()[selected]
+    else:
+        stops = None
+    return SpawnSchedule(offsets, routes, counts, stops)
+
+
+def get_demand_hash(seed, veh_spawn_file, bus_spawn_file, start_time, duration, bus_stop_duration):
+    """
+    Hashes everything the generated route file depends on.
+    """
+    demand_hash = hashlib.sha256()
+    for spawn_file in [veh_spawn_file, bus_spawn_file]:
+        with open(spawn_file, "rb") as f:
+            demand_hash.update(f.read())
+    demand_hash.update(f"{seed}|{start_time}|{duration}|{bus_stop_duration}|{DEMAND_COMPILER_VERSION}".encode())
+    return demand_hash.hexdigest()[:16]
+
+
+def compile_demand(seed, veh_spawn_file, bus_spawn_file, start_time, duration, bus_stop_duration, cache_dir):
+    """
+    Compiles the spawn tables into a SUMO route file for the given seed, with
+    vehicle types, departures and bus stops. Vehicle ids and the random draws
+    of the vehicle classes are the same as when inserting the vehicles with
+    TraCI after np.random.seed(seed), and the vehicles depart like vehicles
+    added with TraCI (DEPART_ATTRIBUTES). Generated files are cached by a hash of
+    all inputs. Returns the route file.
+    """
+    demand_hash = get_demand_hash(seed, veh_spawn_file, bus_spawn_file, start_time, duration, bus_stop_duration)
+    route_file = os.path.join(cache_dir, f"Demand_seed_{seed}_{demand_hash}.rou.xml")
+    if os.path.isfile(route_file):
+        return route_file
+    rng = np.random.RandomState(seed)
+    veh_spawn_schedule = compile_spawn_schedule(veh_spawn_file, start_time, duration)
+    bus_spawn_schedule = compile_spawn_schedule(bus_spawn_file, start_time, duration)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<!-- generated by Demand.py (version {DEMAND_COMPILER_VERSION}), seed {seed} -->',
+             '<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">']
+    veh_ctr = 0
+    for step in range(0, duration+1):
+        for row in veh_spawn_schedule.rows(step):
+            desired_route = veh_spawn_schedule.routes[row]
+            for x in range(0, veh_spawn_schedule.counts[row]):
+                veh_ctr += 1
+                new_vehicle_id = "VEH_"+str(veh_ctr)
+                no_truck = determine_whether_truck_banned_route(desired_route)
+                vehicle_class = get_random_vehicle_class(no_truck, rng)
+                lines.append(f'    <vehicle id={quoteattr(new_vehicle_id)} type="{sumo_vehicle_types[vehicle_class]}" '
+                             f'route={quoteattr(desired_route)} depart="{step}.00" {DEPART_ATTRIBUTES}/>')
+        for row in bus_spawn_schedule.rows(step):
+            desired_route = bus_spawn_schedule.routes[row]
+            veh_ctr += 1
+            new_vehicle_id = "BUS_"+str(veh_ctr)+"-"+desired_route
+            lines.append(f'    <vehicle id={quoteattr(new_vehicle_id)} type="{sumo_vehicle_types["bus"]}" '
+                         f'route={quoteattr(desired_route)} depart="{step}.00" {DEPART_ATTRIBUTES}>')
+            for stop in bus_spawn_schedule.stops[row].split("-"):
+                lines.append(f'        <stop busStop={quoteattr(stop)} duration="{bus_stop_duration}"/>')
+            lines.append('    </vehicle>')
+    lines.append('</routes>')
+    # Write atomically, parallel simulations may compile the same file
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = f"{route_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="utf-8", newline="\n") as f:
+        f.write("\n".join(lines)+"\n")
+    os.replace(temp_file, route_file)
+    return route_file
@@ -20,12 +20,17 @@
 # ###### IMPORTS ##############################################################
 # #############################################################################
 from bayes_opt import BayesianOptimization
-from RunSimulation import Simulation
-import multiprocessing
+from bayes_opt.acquisition import ConstantLiar, UpperConfidenceBound
+from RunSimulation import CONTROL_MODE
+from WorkerPool import SumoWorkerPool
+from AsyncDriver import run_jobs, ASYNC_CONCURRENCY
 import os
 import sys
 import numpy as np
 import csv
+import queue
+import functools
+from scipy import stats
 # Set SUMO path if available
 if 'SUMO_HOME' in os.environ:
     sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
@@ -41,23 +46,162 @@ Run simulations across all seeds with given parameter set.
 Aggregates results.
 """
 SEEDS = [41,42,43,44,45,46,47,48,49,50,51,52,53,54,55,56,57,58,59,60]
-def main(adaptation_cycle,adaptation_green,green_thresh,adaptation_offset,offset_thresh):
+SIMULATION_DRIVER = "POOL" # POOL (worker processes, see WorkerPool.py), ASYNC (one process, see AsyncDriver.py)
+OPTIMIZATION_MODE = "SEQUENTIAL" # SEQUENTIAL (one candidate at a time), ASYNC_BATCH (several candidates in flight, on the worker pool)
+CONCURRENT_CANDIDATES = 4 # Candidates in flight at once (ASYNC_BATCH)
+RACING = False # Evaluate candidates on growing subsets of seeds and stop dominated ones early (SEQUENTIAL)
+RACING_RUNGS = [4, 8] # Seeds after which a candidate is compared with the incumbent (then all SEEDS)
+RACING_ALPHA = 0.05 # Significance level of the comparison (paired one-sided t-test per seed)
+RACING_ORDER_SEEDS = True # Evaluate the most discriminative seeds first (once 3 candidates are complete)
+RACING_LOG = "racing_log.csv"
+
+class OptimizerState:
+    """
+    State of one optimization run, passed to the functions that simulate and
+    race the candidates.
+    """
+    def __init__(self):
+        self.pool = None # Worker pool (created on first use)
+        self.incumbent = None # Per-seed costs of the best complete candidate (RACING)
+        self.complete_seed_costs = [] # Per-seed costs of all complete candidates (RACING)
+
+    def get_pool(self):
+        """
+        Returns the worker pool, which is created once and reused for all
+        candidates (every simulation runs with its own SimulationContext, and
+        the workers keep SUMO open between simulations).
+        """
+        if self.pool is None:
+            jobs_in_flight = len(SEEDS) * (CONCURRENT_CANDIDATES if OPTIMIZATION_MODE == "ASYNC_BATCH" else 1)
+            self.pool = SumoWorkerPool(min(jobs_in_flight, os.cpu_count()))
+        return self.pool
+
+    def close(self):
+        """
+        Prints the SUMO startup summary and closes the worker pool.
+        """
+        if self.pool is not None:
+            self.pool.print_startup_summary()
+            self.pool.close()
+            self.pool = None
+
+def get_params(adaptation_cycle,adaptation_green,green_thresh,adaptation_offset,offset_thresh):
+    """
+    Returns the parameters of a simulation for an optimized candidate.
+    """
     alpha = 0.5518
     Changetime =2
     Thresholdtime = 5
-    # Prepare partial simulation
-    param_sets = [
-        (seed, adaptation_cycle, adaptation_green, green_thresh, adaptation_offset, offset_thresh,alpha, Changetime, Thresholdtime)
-        for seed in SEEDS
-    ]
-    # Parallel execution using multiprocessing
-    with multiprocessing.Pool(min(len(SEEDS), os.cpu_count())) as pool:
-        results = pool.map(Simulation, param_sets)
+    return (adaptation_cycle, adaptation_green, green_thresh, adaptation_offset, offset_thresh,alpha, Changetime, Thresholdtime)
+
+def run_seeds(state, params, seeds):
+    """
+    Simulates a candidate for the given seeds and returns the metrics in order.
+    """
+    jobs = [(CONTROL_MODE, params, seed) for seed in seeds]
+    # Parallel execution on the worker pool (or interleaved in this process)
+    if SIMULATION_DRIVER == "ASYNC":
+        return run_jobs(jobs, ASYNC_CONCURRENCY)
+    return state.get_pool().map(jobs)
+
+def main(state, adaptation_cycle,adaptation_green,green_thresh,adaptation_offset,offset_thresh):
+    params = get_params(adaptation_cycle,adaptation_green,green_thresh,adaptation_offset,offset_thresh)
+    if RACING:
+        return race_candidate(state, params)
+    results = run_seeds(state, params, SEEDS)
+    return evaluate_candidate(params, results)
+
+def get_seed_cost(result):
+    # Cost of one seed (as in evaluate_candidate)
+    return -1 * result[9]
+
+def get_racing_seed_order(state):
+    """
+    Returns the seeds in racing order, the seeds whose costs vary most
+    between the complete candidates come first.
+    """
+    if not RACING_ORDER_SEEDS or len(state.complete_seed_costs) < 3:
+        return list(SEEDS)
+    spread = {seed: np.std([costs[seed] for costs in state.complete_seed_costs]) for seed in SEEDS}
+    return sorted(SEEDS, key=lambda seed: -spread[seed])
+
+def compare_with_incumbent(state, seed_costs):
+    """
+    Tests whether a candidate is worse than the incumbent on the seeds
+    evaluated so far, returns the decision (PRUNE or CONTINUE) and p-value.
+    """
+    if state.incumbent is None:
+        return "CONTINUE", np.nan
+    candidate = np.array([seed_costs[seed] for seed in seed_costs])
+    best = np.array([state.incumbent[seed] for seed in seed_costs])
+    differences = candidate - best
+    if np.std(differences) == 0:
+        p_value = 0.0 if np.mean(differences) < 0 else 1.0
+    else:
+        p_value = stats.ttest_rel(candidate, best, alternative="less").pvalue
+    return ("PRUNE" if p_value < RACING_ALPHA else "CONTINUE"), p_value
+
+def log_racing_decision(state, params, seed_costs, decision, p_value):
+    """
+    Appends a racing decision to the racing log.
+    """
+    file_exists = os.path.isfile(RACING_LOG)
+    with open(RACING_LOG, mode='a', newline='') as file:
+        writer = csv.writer(file)
+        if not file_exists:
+            writer.writerow(['adaptation_cycle', 'adaptation_green', 'green_thresh', 'adaptation_offset', 'offset_thresh',
+                             'alpha', 'Changetime', 'Thresholdtime', 'Seeds', 'Mean Cost', 'Incumbent Mean Cost',
+                             'P Value', 'Decision'])
+        incumbent_cost = np.mean([state.incumbent[seed] for seed in seed_costs]) if state.incumbent is not None else np.nan
+        writer.writerow(list(params) + [len(seed_costs), np.mean(list(seed_costs.values())), incumbent_cost,
+                                        p_value, decision])
+    print(f"Racing: {decision} after {len(seed_costs)} seeds (p={p_value:.3f})", flush=True)
+
+def race_candidate(state, params):
+    """
+    Evaluates a candidate on growing subsets of seeds (successive halving
+    against the incumbent). A candidate whose cost is significantly worse
+    than the incumbent's on the same seeds is stopped, and the worst cost of
+    the complete candidates is returned (its partial mean over the most
+    discriminative seeds is not comparable); complete candidates are
+    evaluated as usual.
+    """
+    seeds = get_racing_seed_order(state)
+    results = {}
+    for rung in RACING_RUNGS + [len(SEEDS)]:
+        new_seeds = seeds[len(results):rung]
+        results.update(zip(new_seeds, run_seeds(state, params, new_seeds)))
+        seed_costs = {seed: get_seed_cost(results[seed]) for seed in results}
+        if len(results) == len(SEEDS):
+            break
+        decision, p_value = compare_with_incumbent(state, seed_costs)
+        log_racing_decision(state, params, seed_costs, decision, p_value)
+        if decision == "PRUNE":
+            cost = min(np.mean(list(costs.values())) for costs in state.complete_seed_costs)
+            return evaluate_candidate(params, [results[seed] for seed in seeds if seed in results], cost)
+    cost = evaluate_candidate(params, [results[seed] for seed in SEEDS])
+    state.complete_seed_costs.append(seed_costs)
+    if state.incumbent is None or cost > np.mean(list(state.incumbent.values())):
+        state.incumbent = seed_costs
+    log_racing_decision(state, params, seed_costs, "COMPLETE", np.nan)
+    return cost
+
+def evaluate_candidate(params, results, pruned_cost=None):
+    """
+    Aggregates the results of a candidate over all seeds (in the order of
+    SEEDS), logs them and returns the cost. Pruned candidates (RACING) are
+    aggregated over their evaluated seeds, and logged with the cost they are
+    registered with (pruned_cost).
+    """
+    adaptation_cycle, adaptation_green, green_thresh, adaptation_offset, offset_thresh,alpha, Changetime, Thresholdtime = params
     results_array = np.array(results)
     mean_results = np.mean(results_array, axis=0)
     std_results = np.std(results_array, axis=0)
     # Print Aggregated Results
-    print("\n=== Aggregated Results ===")
+    if pruned_cost is None:
+        print("\n=== Aggregated Results ===")
+    else:
+        print(f"\n=== Aggregated Results (pruned after {len(results)} seeds) ===")
     print(f"Mean Total Throughput:     {mean_results[0]:.2f} ± {std_results[0]:.2f} veh")
     print(f"Mean Total Flow:           {mean_results[1]:.2f} ± {std_results[1]:.2f} veh/h")
     print(f"Mean Avg Speed:            {mean_results[2]:.2f} ± {std_results[2]:.2f} m/s")
@@ -71,11 +215,11 @@ def main(adaptation_cycle,adaptation_green,green_thresh,adaptation_offset,offset
     print(f"Mean Gini Sideroad:        {mean_results[10]:.3f} ± {std_results[10]:.3f}")
     print(f"Mean Gini Mainroad:        {mean_results[11]:.3f} ± {std_results[11]:.3f}")
     # Use negative Metric as Cost for Optimization
-    cost = -1 * mean_results[9]
+    cost = -1 * mean_results[9] if pruned_cost is None else pruned_cost
     # Prepare row for CSV logging
     csv_row = [
      adaptation_cycle, adaptation_green, green_thresh, adaptation_offset, offset_thresh, alpha, Changetime, Thresholdtime
-     ] + mean_results.tolist() + std_results.tolist() + [cost] # Add cost at end
+     ] + mean_results.tolist() + std_results.tolist() + [cost, pruned_cost is not None, len(results)] # Add cost at end
     # Write or append to CSV
     csv_file = "bayes_opt_log.csv"
     file_exists = os.path.isfile(csv_file)
@@ -86,21 +230,59 @@ def main(adaptation_cycle,adaptation_green,green_thresh,adaptation_offset,offset
                  'adaptation_cycle', 'adaptation_green', 'green_thresh', 'adaptation_offset', 'offset_thresh',
                  'alpha','Changetime','Thresholdtime',"Total Throughput", "Total Flow", "Avg Speed", "Avg Density", "Avg Delay",
                  "Avg Delay Sideroad", "Avg Delay Mainroad", "Max Delay", "Total Travel Time",
-                 "Gini Total", "Gini Sideroad", "Gini Mainroad", "Cost"
+                 "Gini Total", "Gini Sideroad", "Gini Mainroad", "Cost", "pruned", "seeds_evaluated"
              ])
          writer.writerow(csv_row)
     return cost
 
+def maximize_async(state, optimizer, init_points, n_iter, concurrent_candidates=CONCURRENT_CANDIDATES):
+    """
+    Maximizes with several candidates in flight at once. The seed jobs of all
+    candidates share the worker pool, and a candidate is registered as soon
+    as its last seed returns; new candidates are suggested with a constant
+    liar acquisition (pending candidates count as already evaluated), the
+    first init_points candidates are random.
+    """
+    n_candidates = init_points + n_iter
+    done = queue.Queue()
+    in_flight = {} # candidate -> (probe, params, {seed: metrics})
+    submitted = 0
+    while submitted < n_candidates or len(in_flight) > 0:
+        # Keep the configured number of candidates in flight
+        while submitted < n_candidates and len(in_flight) < concurrent_candidates:
+            probe = optimizer.random_sample(1)[0] if submitted < init_points else optimizer.suggest()
+            params = get_params(**probe)
+            in_flight[submitted] = (probe, params, {})
+            for seed in SEEDS:
+                state.get_pool().submit((CONTROL_MODE, params, seed),
+                                  lambda result, candidate=submitted, seed=seed: done.put((candidate, seed, result)))
+            submitted += 1
+        # Collect the next finished seed
+        candidate, seed, result = done.get()
+        if isinstance(result, Exception):
+            raise result
+        probe, params, results = in_flight[candidate]
+        results[seed] = result
+        if len(results) == len(SEEDS):
+            del in_flight[candidate]
+            cost = evaluate_candidate(params, [results[s] for s in SEEDS])
+            optimizer.register(params=probe, target=cost)
+            print(f"Candidate {candidate+1}/{n_candidates}: {cost:.4f} ({len(in_flight)} in flight)", flush=True)
+
 
 
 
 # #############################################################################
 # ## ENTRY POINT AND BAYESIAN OPTIMIZER
 # #############################################################################
-if __name__ == "__main__":
-    # Optional: Use Bayesian Optimization to find best parameter configuration
+def run_optimization(state, init_points=15, n_iter=120):
+    """
+    Finds the best parameter configuration with Bayesian Optimization and
+    returns the optimizer.
+    """
     optimizer = BayesianOptimization(
-        f=main,
+        f=functools.partial(main, state),
+        acquisition_function=ConstantLiar(UpperConfidenceBound(kappa=2.576)) if OPTIMIZATION_MODE == "ASYNC_BATCH" else None,
         pbounds={
             'adaptation_cycle': (10, 50),
             'adaptation_green': (5, 20),
@@ -113,11 +295,23 @@ if __name__ == "__main__":
         },
         random_state=42,
     )
-    optimizer.maximize(init_points=15, n_iter=120)
+    if OPTIMIZATION_MODE == "ASYNC_BATCH":
+        maximize_async(state, optimizer, init_points=init_points, n_iter=n_iter)
+    else:
+        optimizer.maximize(init_points=init_points, n_iter=n_iter)
+    return optimizer
+
+if __name__ == "__main__":
+    # Optional: Use Bayesian Optimization to find best parameter configuration
+    state = OptimizerState()
+    try:
+        optimizer = run_optimization(state)
+    finally:
+        state.close()
     print("\n=== BEST PARAMETERS ===")
     print(f"Best Params: {optimizer.max['params']}")
     print(f"Best Score:  {optimizer.max['target']}")
 """
 #Manual call
-main(39.2797576724562, 13.979877262955549, 0.7799726016810132, 0.22481491235394924, 0.03485016730091967, 4.2472407130841745, 53.02857225639664)
+main(OptimizerState(), 39.2797576724562, 13.979877262955549, 0.7799726016810132, 0.22481491235394924, 0.03485016730091967, 4.2472407130841745, 53.02857225639664)
 """
\ No newline at end of file
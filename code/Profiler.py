@@ -0,0 +1,182 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the profiler of the simulation loop. It records the
+    time per loop stage and per controller function (cumulative and
+    percentiles) and counts the TraCI calls per domain. Profiling is switched
+    on per run (RunSimulation.PROFILING); when it is off, the loop calls a
+    no-op profiler and the profiled functions only check whether a profiler
+    is active.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import json
+import time
+import functools
+import numpy as np
+import traci
+
+
+
+
+# #############################################################################
+# ###### GLOBAL VARIABLES #####################################################
+# #############################################################################
+    # TraCI domains whose calls are counted
+TRACI_DOMAINS = ["simulation", "vehicle", "lane", "edge", "route", "trafficlight", "inductionloop"]
+    # Profiler of the running simulation (None: profiling disabled)
+active = None
+    # Original TraCI functions replaced by counting wrappers [(domain, name, function, own attribute)]
+traci_originals = []
+
+
+
+
+# #############################################################################
+# ###### PROFILERS ############################################################
+# #############################################################################
+class StepProfiler:
+    def __init__(self):
+        self.stage_times = {}
+        self.function_times = {}
+        self.traci_calls = {}
+        self.last = None
+        self.start_time = time.perf_counter()
+
+    def lap(self, stage):
+        """
+        Records the time since the previous lap for the given loop stage.
+        """
+        now = time.perf_counter()
+        if self.last is not None:
+            self.stage_times.setdefault(stage, []).append(now - self.last)
+        self.last = now
+
+    def add_function_time(self, name, duration):
+        self.function_times.setdefault(name, []).append(duration)
+
+    def count_call(self, key):
+        self.traci_calls[key] = self.traci_calls.get(key, 0) + 1
+
+    def report(self, **info):
+        """
+        Returns the profile as dict (timings in seconds).
+        """
+        report = dict(info)
+        report["total_time"] = time.perf_counter() - self.start_time
+        report["stages"] = {name: summarize_times(times) for name, times in self.stage_times.items()}
+        report["functions"] = {name: summarize_times(times) for name, times in self.function_times.items()}
+        calls_by_domain = {}
+        for key, count in self.traci_calls.items():
+            domain = key.split(".")[0]
+            calls_by_domain[domain] = calls_by_domain.get(domain, 0) + count
+        report["traci_calls"] = {"total": sum(self.traci_calls.values()), "by_domain": calls_by_domain,
+                                 "by_function": dict(sorted(self.traci_calls.items()))}
+        return report
+
+    def save(self, file, **info):
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "w") as f:
+            json.dump(self.report(**info), f, indent=2)
+
+
+class NullProfiler:
+    def lap(self, stage):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def summarize_times(times):
+    """
+    Cumulative and percentile timings of a list of durations.
+    """
+    times = np.asarray(times)
+    return {"count": len(times), "total": float(np.sum(times)), "mean": float(np.mean(times)),
+            "p50": float(np.percentile(times, 50)), "p90": float(np.percentile(times, 90)),
+            "p99": float(np.percentile(times, 99)), "max": float(np.max(times))}
+
+
+def activate(profiler):
+    """
+    Sets the profiler of the running simulation (None disables profiling).
+    """
+    global active
+    active = profiler
+
+
+def profiled(name):
+    """
+    Decorator recording the duration of every call in the active profiler.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                active.add_function_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count_traci_calls(function, key):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if active is not None:
+            active.count_call(key)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def install_traci_counters():
+    """
+    Wraps the functions of the TraCI domains to count their calls (once).
+    """
+    if len(traci_originals) > 0:
+        return
+    for domain_name in TRACI_DOMAINS:
+        domain = getattr(traci, domain_name)
+        for name in dir(domain):
+            function = getattr(domain, name)
+            if name.startswith("_") or not callable(function) or isinstance(function, type):
+                continue
+            own_attribute = name in getattr(domain, "__dict__", {})
+            traci_originals.append((domain, name, function, own_attribute))
+            setattr(domain, name, count_traci_calls(function, domain_name+"."+name))
+
+
+def remove_traci_counters():
+    """
+    Restores the original functions of the TraCI domains.
+    """
+    for domain, name, function, own_attribute in traci_originals:
+        if own_attribute:
+            setattr(domain, name, function)
+        else:
+            delattr(domain, name)
+    del traci_originals[:]
@@ -0,0 +1,140 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the result cache, which stores the metrics of every
+    simulation on disk. The key is a hash of the controller, the parameters
+    this controller actually uses, the seed, the run settings, and the hashes
+    of the model files and of the simulation code, so that repeated or resumed
+    optimization campaigns do not simulate the same evaluation again.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import json
+import hashlib
+
+
+
+
+# #############################################################################
+# ###### RESULT CACHE PARAMETER ###############################################
+# #############################################################################
+    # Version of the cached results (increase when the metrics change)
+RESULT_CACHE_VERSION = 1
+    # Parameters (after the seed) used by each controller, all others do not affect the result
+PARAM_NAMES = ["adaptation_cycle", "adaptation_green", "green_thresh", "adaptation_offset", "offset_thresh",
+               "alpha", "Changetime", "Thresholdtime"]
+CONTROLLER_PARAMS = {"FIXED_CYCLE": [],
+                     "MAX_PRESSURE": [],
+                     "SCOSCA": PARAM_NAMES[:5],
+                     "SCOSCAFAIRV1": PARAM_NAMES[:5] + ["alpha"],
+                     "SCOSCAFAIRV2": PARAM_NAMES[:5] + ["Changetime", "Thresholdtime"]}
+    # Model and code files whose content is part of the key
+MODEL_DIR = "../model"
+MODEL_EXCLUDED_DIRS = ["logs", "cache"]
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+CODE_EXCLUDED_FILES = ["AsyncDriver.py", "Optimizer.py", "Profiler.py", "ResultCache.py", "WorkerPool.py"]
+    # Caches the file hashes per process (files do not change during a campaign)
+file_hashes = {}
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def hash_files(files):
+    """
+    Returns a hash of the names and contents of the given files.
+    """
+    digest = hashlib.sha256()
+    for file in sorted(files):
+        digest.update(os.path.basename(file).encode())
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_model_hash(model_dir=MODEL_DIR):
+    """
+    Returns the hash of all model files (logs and caches excluded).
+    """
+    key = ("model", os.path.abspath(model_dir))
+    if key not in file_hashes:
+        files = []
+        for root, dirs, names in os.walk(model_dir):
+            dirs[:] = sorted(d for d in dirs if not (root == model_dir and d in MODEL_EXCLUDED_DIRS))
+            files += [os.path.join(root, name) for name in names]
+        file_hashes[key] = hash_files(files)
+    return file_hashes[key]
+
+
+def get_code_hash(code_dir=CODE_DIR):
+    """
+    Returns the hash of the simulation code (drivers and tools excluded).
+    """
+    key = ("code", os.path.abspath(code_dir))
+    if key not in file_hashes:
+        files = [os.path.join(code_dir, name) for name in os.listdir(code_dir)
+                 if name.endswith(".py") and name not in CODE_EXCLUDED_FILES]
+        file_hashes[key] = hash_files(files)
+    return file_hashes[key]
+
+
+def get_result_key(controller, params, settings):
+    """
+    Returns the cache key of a simulation, params = (seed, adaptation_cycle,
+    ..., Thresholdtime) as passed to RunSimulation.Simulation, settings are
+    the run settings that affect the result.
+    """
+    seed = params[0]
+    values = dict(zip(PARAM_NAMES, params[1:]))
+    key = {"version": RESULT_CACHE_VERSION,
+           "controller": controller,
+           "params": {name: float(values[name]) for name in CONTROLLER_PARAMS[controller]},
+           "seed": int(seed),
+           "settings": settings,
+           "model": get_model_hash(),
+           "code": get_code_hash()}
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_result_file(cache_dir, controller, seed, key):
+    return os.path.join(cache_dir, f"Result_{controller}_seed_{seed}_{key[:16]}.json")
+
+
+def load_result(result_file):
+    """
+    Loads the metrics of a cached simulation, None if there is none.
+    """
+    if not os.path.isfile(result_file):
+        return None
+    with open(result_file, "r") as f:
+        return tuple(json.load(f)["metrics"])
+
+
+def save_result(result_file, metrics):
+    """
+    Saves the metrics of a simulation (written atomically, parallel
+    simulations may save the same result).
+    """
+    os.makedirs(os.path.dirname(result_file), exist_ok=True)
+    temp_file = f"{result_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump({"metrics": [m.item() if hasattr(m, "item") else m for m in metrics]}, f)
+    os.replace(temp_file, result_file)
@@ -21,20 +21,28 @@
 # #############################################################################
 import os
 import sys
+from Backend import SUMO_BACKEND, check_backend # selects traci or libsumo, has to precede "import traci"
 import traci
 import time
-import pandas as pd
 import numpy as np
 import random
 import warnings
-from datetime import datetime, timedelta
+from datetime import datetime
 from Utils import (calculate_degree_of_saturation_SCATS,get_throughput,
-                    get_average_delay_total, get_queue_lengths,get_total_travel_time,
-                    get_flow,get_total_distance,get_density,get_max_delay,get_gini, get_waiting_times)
-from ControllerMaxPressure import WEIGHTS_MAX_PRESSURE, signal_controllers
+                    get_metrics, get_queue_lengths,get_max_delay,get_gini, get_waiting_times)
 from ControllerSCOSCA import setup_scosca_control
 from ControllerFairSCOSCA_1 import setup_scoscafairv1_control
 from ControllerFairSCOSCA_2 import setup_scoscafairv2_control, Optimizer_Fairness
+from StateEngine import acquire_vehicle_state, get_hidden_vehicles_by_edge
+from Demand import (compile_spawn_schedule, compile_demand, get_demand_hash, get_random_vehicle_class,
+                    determine_whether_truck_banned_route, sumo_vehicle_types)
+from Snapshot import (SNAPSHOT_CONTROLLERS, SNAPSHOT_SUMO_ARGS, get_snapshot_files, snapshot_exists,
+                      save_snapshot, load_snapshot_trackers)
+from ResultCache import get_result_key, get_result_file, load_result, save_result
+from StateEngine import subscribe_vehicles, subscribe_lanes, clear_subscription_results
+from SimulationContext import SimulationContext
+from Watchdog import GridlockWatchdog, GRIDLOCK_PENALTY
+import Profiler
 if 'SUMO_HOME' in os.environ:
     sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
 warnings.filterwarnings("ignore")
@@ -46,7 +54,7 @@ warnings.filterwarnings("ignore")
 # #############################################################################
 # ###### RUN ARGUMENTS PARSING ################################################
 # #############################################################################
-SUMO_BINARY = "C:/Users/juweiss/AppData/Local/sumo-1.22.0/bin/sumo.exe"  # Adjust if needed
+SUMO_BINARY = os.environ.get("SUMO_BINARY", "C:/Users/juweiss/AppData/Local/sumo-1.22.0/bin/sumo.exe")  # Adjust if needed
 CONTROL_MODE = "SCOSCA" # FIXED_CYCLE, MAX_PRESSURE, SCOSCA, SCOSCAFAIRV1, SCOSCAFAIRV2
 sys.argv = ['RunSimulation.py',
             '--sumo-path', SUMO_BINARY,
@@ -68,14 +76,39 @@ SIMULATION_STEPS_PER_SECOND = 1
 SIMULATION_WAIT_TIME = 0
 START_TIME = datetime.strptime("2024-03-04 15:15:00", "%Y-%m-%d %H:%M:%S")
 END_TIME = datetime.strptime("2024-03-04 17:45:00", "%Y-%m-%d %H:%M:%S")
-SIMULATION_TIMES = [dt.strftime("%Y-%m-%d %H:%M:%S") for dt in [START_TIME + timedelta(seconds=i) for i in range(int((END_TIME - START_TIME).total_seconds()) + 1)]]
 SIMULATION_DURATION = int((END_TIME - START_TIME).total_seconds())
+WARMUP_DURATION = 1800 # SECS, metrics are recorded from this step on
     # PUBLIC TRANSPORT PARAMETER
 BUS_STOP_DURATION = 20 # SECS
+    # DEMAND PARAMETER
+DEMAND_MODE = "RUNTIME" # RUNTIME (vehicles added with TraCI), COMPILED (route file per seed loaded by SUMO)
+DEMAND_CACHE_DIR = "../model/cache/demand"
+    # WARM-UP SNAPSHOT PARAMETER
+WARMUP_SNAPSHOTS = False # Resume from a cached SUMO state at the end of the warm-up
+WARMUP_CONTROLLER = "FIXED_CYCLE" # Controller during the warm-up when using snapshots: FIXED_CYCLE, MAX_PRESSURE
+SNAPSHOT_CACHE_DIR = "../model/cache/snapshots"
+    # METRIC PARAMETER
+STREAMING_GINI = False # Bounded-memory delay histograms instead of per-vehicle delays for the Gini coefficients
+DELAY_SPILL = False # Spill the delays of arrived vehicles to a temporary file (bounded memory in all-day simulations)
+    # FAIRSCOSCA_1 WAITING TIME PARAMETER
+WAITING_TIME_MODE = "VEHICLE" # VEHICLE (speed and waiting time per vehicle), LANE (halting number per lane)
+WAITING_TIME_VALIDATION = None # Mode calculated alongside and recorded per cycle (see benchmarks/Validate_WaitingTimes.py)
+    # SUMO WORKER PARAMETER
+PERSISTENT_SUMO = False # Keep SUMO open after a run, the next run resets it with traci.load (see WorkerPool.py)
+sumo_running = False # Whether this process holds an open SUMO instance
+    # GRIDLOCK WATCHDOG PARAMETER
+GRIDLOCK_WATCHDOG = False # Abort gridlocked runs with penalty metrics (criteria see Watchdog.py)
+    # RESULT CACHE PARAMETER
+RESULT_CACHE = False # Reuse the metrics of identical simulations (see ResultCache.py), no logs are written then
+RESULT_CACHE_DIR = "../model/cache/results"
+    # PROFILING
+PROFILING = False # Time the loop stages and controller functions and count TraCI calls (see Profiler.py)
+PROFILE_FILE = "../model/logs/Profile_{controller}_seed_{seed}.json"
     # DEBUGGING
 DEBUG_CONTROLLER_LOG = "NONE"# "intersection2"
 DEBUG_TIME = True
 DEBUG_GUI = True
+DEBUG_DIAGNOSTICS = False # Print run statistics (SUMO startup, ...) with the metrics, Output.txt then contains more than the metrics
 
 
 
@@ -84,31 +117,6 @@ DEBUG_GUI = True
 # ###### METHODS ##############################################################
 # #############################################################################
 
-def get_random_vehicle_class(no_truck=False):
-    probs = [0.81, 0.082, 0.046, 0.062]
-    vals = ["car", "moc", "lwt", "hwt"]
-    random_vehicle_class = np.random.choice(vals, size=1, p=probs)[0]
-    while no_truck and random_vehicle_class=="hwt":
-        random_vehicle_class = np.random.choice(vals, size=1, p=probs)[0]
-    return random_vehicle_class
-
-def determine_whether_truck_banned_route(desired_route):
-    route_entrance = desired_route.split("_")[1]
-    route_exit = desired_route.split("_")[2]
-    selected_entrances = ["E21", "E22", "E24", "E25", "E20", "E3", "E4", "E5", "E1", "E2", "E6", "E7", "E12", "E13"]
-    selected_exits = ["A1", "A2", "A3", "A16", "A18", "A15"]
-    if route_entrance in selected_entrances and route_exit in selected_exits:
-        return False
-    return True
-
-sumo_vehicle_types = {
-    "car": "sumo_car",
-    "moc": "sumo_motorcycle",
-    "lwt": "sumo_transporter",
-    "hwt": "sumo_truck",
-    "bus": "sumo_bus",
-}
-
 def spawn_random_vehicle(veh_ctr, desired_route):
     # determine vehicle characteristics
     new_vehicle_id = "VEH_"+str(veh_ctr)
@@ -117,8 +125,6 @@ def spawn_random_vehicle(veh_ctr, desired_route):
     vehicle_type = sumo_vehicle_types[vehicle_class]
     # add vehicle with traci
     traci.vehicle.add(new_vehicle_id, desired_route, typeID=vehicle_type)
-    veh_routes[new_vehicle_id] = desired_route
-    veh_classes[new_vehicle_id] = vehicle_class
     
 def spawn_random_bus(veh_ctr, desired_route, stops):
     # determine vehicle characteristics
@@ -129,36 +135,69 @@ def spawn_random_bus(veh_ctr, desired_route, stops):
     traci.vehicle.add(new_vehicle_id, desired_route, typeID=vehicle_type)
     for stop in stops.split("-"):
         traci.vehicle.setBusStop(new_vehicle_id, stop, duration=BUS_STOP_DURATION)    
-    veh_routes[new_vehicle_id] = desired_route
-    veh_classes[new_vehicle_id] = vehicle_class
 
-def determine_current_state():
-    current_vehicles = traci.vehicle.getIDList()
-    if len(current_vehicles)==0:
-        print(">> NOTHING, so no state")
-        return None, None
-    current_lanes = [traci.vehicle.getLaneID(v_id) for v_id in current_vehicles]
-    new_current_lanes = []
-    for v_ctr in range(0, len(current_vehicles)):
-        if not current_lanes[v_ctr].startswith(":"):
-            new_current_lanes.append(current_lanes[v_ctr])
-        else:
-            v_id = current_vehicles[v_ctr]
-            v_route = traci.vehicle.getRoute(v_id)
-            v_current_edge_index = traci.vehicle.getRouteIndex(v_id)
-            v_current_edge = v_route[v_current_edge_index]
-            new_current_lanes.append("@"+v_current_edge)
-    df_current_status = pd.DataFrame(np.asarray([current_vehicles, new_current_lanes]).transpose(), columns=["veh_id", "lane"])
-    df_current_status["class"] = df_current_status["veh_id"].map(veh_classes)
-    if CONTROL_MODE=="MAX_PRESSURE":
-        df_current_status["weight"] = df_current_status["class"].map(WEIGHTS_MAX_PRESSURE)
-    df_hidden_vehicles = df_current_status[df_current_status["lane"].str.startswith("@")]
-    df_hidden_vehicles["edge"] = df_hidden_vehicles["lane"].str.replace("@","")
-    excluded_edges = {"921020464#1","-331752492#0","38361907","26249185#30","183049933#0","758088375#0","-38361908#1",
-                      "-25973410#1","E3","-E1","-E4","22889927#0","-25576697#0","-22889927#2","-208691154#0",
-                      "E15","E10","E6"}
-    df_hidden_vehicles = df_hidden_vehicles[~df_hidden_vehicles["edge"].isin(excluded_edges)]
-    return df_current_status, df_hidden_vehicles
+def determine_current_state(ctx, control_mode):
+    """
+    Acquires the vehicle state (every step, for the metrics), and builds the
+    hidden vehicles view only for the SCOSCA controllers (the Max Pressure
+    controllers read no vehicle views, see do_signal_logic below).
+    """
+    vehicle_state = acquire_vehicle_state()
+    hidden_by_edge = None
+    if control_mode in ["SCOSCA", "SCOSCAFAIRV1", "SCOSCAFAIRV2"]:
+        hidden_by_edge = get_hidden_vehicles_by_edge(ctx, vehicle_state)
+    if hidden_by_edge is None:
+        ctx.skipped_observations += 1
+    else:
+        ctx.observations += 1
+    return vehicle_state, hidden_by_edge
+
+def launch_sumo(ctx, sumo_args):
+    """
+    Launches SUMO, or resets the open SUMO instance with traci.load (the
+    network and additional files are parsed by the running instance).
+    """
+    global sumo_running
+    options = [
+        "-c", "../model/Configuration.sumocfg",
+        "--quit-on-end",
+        "--start",
+        "--time-to-teleport", "-1",
+        "--waiting-time-memory", "6000"
+    ] + sumo_args
+    check_backend(SUMO_BACKEND, SUMO_BINARY, traci.isLibsumo())
+    start = time.perf_counter()
+    if ctx.label is not None:
+        # Labelled connections (several simulations in one process) are not kept open
+        traci.start([SUMO_BINARY] + options, label=ctx.label)
+        ctx.startup_mode = "start"
+    elif sumo_running:
+        traci.load(options)
+        clear_subscription_results()
+        ctx.startup_mode = "load"
+    else:
+        traci.start([SUMO_BINARY] + options)
+        sumo_running = True
+        ctx.startup_mode = "start"
+    ctx.startup_time = time.perf_counter() - start
+    if DEBUG_DIAGNOSTICS:
+        print(f"SUMO STARTUP ({ctx.startup_mode}): {ctx.startup_time:.2f} sec", flush=True)
+
+def close_sumo():
+    """
+    Closes the SUMO instance of this process (if open).
+    """
+    global sumo_running
+    if sumo_running:
+        sumo_running = False
+        try:
+            traci.close()
+        except (traci.FatalTraCIError, traci.TraCIException):
+            pass
+
+def subscribe_waiting_time_lanes(ctx, lanes):
+    if ctx.controller=="SCOSCAFAIRV1" and "LANE" in (WAITING_TIME_MODE, WAITING_TIME_VALIDATION):
+        subscribe_lanes([lane for junction_lanes in lanes.values() for lane in junction_lanes])
 
 
 
@@ -166,34 +205,67 @@ def determine_current_state():
 # #############################################################################
 # ###### MAIN CODE ############################################################
 # #############################################################################
-def Simulation(params):
-    #Define Global Variables
-    global veh_routes, veh_classes
-    global df_current_status, df_hidden_vehicles
-    global tracked_vehiclesIN
-    global last_vehicles_average, vehicle_waiting_times_average
-    global last_vehicles_total, vehicle_departure_times
+def get_result_cache_file(params, ctx):
+    """
+    Returns the result cache file of a simulation, None if the result cache
+    is not used (disabled, or runs recording profiles or validations).
+    """
+    if not RESULT_CACHE or PROFILING or WAITING_TIME_VALIDATION is not None:
+        return None
+    controller = ctx.controller if ctx.controller is not None else CONTROL_MODE
+    settings = {"start_time": START_TIME.isoformat(), "duration": SIMULATION_DURATION, "warmup": WARMUP_DURATION,
+                "steps_per_second": SIMULATION_STEPS_PER_SECOND, "bus_stop_duration": BUS_STOP_DURATION,
+                "demand_mode": DEMAND_MODE, "warmup_snapshots": WARMUP_SNAPSHOTS, "warmup_controller": WARMUP_CONTROLLER,
+                "streaming_gini": STREAMING_GINI, "waiting_time_mode": WAITING_TIME_MODE, "backend": SUMO_BACKEND,
+                "gridlock_watchdog": GRIDLOCK_WATCHDOG}
+    key = get_result_key(controller, params, settings)
+    return get_result_file(RESULT_CACHE_DIR, controller, params[0], key)
+
+def print_metrics(metrics):
+    """
+    Prints the metrics of a simulation (the format of Output.txt).
+    """
+    (throughput,flow,avg_speed,avg_density,avg_delay,avg_delay_sideroad,
+     avg_delay_mainroad,max_delay,TTT,gini_total,gini_sideroad,gini_mainroad) = metrics
+    print(f"THROUGHPUT: {throughput}",flush=True)
+    print(f"FLOW: {flow}",flush=True)
+    print(f"AVG SPEED: {avg_speed}",flush=True)
+    print(f"DENSITY: {avg_density}",flush=True)
+    print(f"AVG DELAY: {avg_delay}",flush=True)
+    print(f"AVG. DELAY SIDEROAD: {avg_delay_sideroad}",flush=True)
+    print(f"AVG. DELAY MAINROAD: {avg_delay_mainroad}",flush=True)
+    print(f"MAX DELAY: {max_delay}",flush=True)
+    print(f"TOTAL TRAVEL TIME: {TTT}",flush=True)
+    print(f"GINI TOTAL: {gini_total}",flush=True)
+    print(f"GINI SIDEROAD: {gini_sideroad}",flush=True)
+    print(f"GINI MAINROAD: {gini_mainroad}",flush=True)
+
+def simulate(params, ctx):
+    """
+    Runs one simulation as a generator, which yields the number of SUMO steps
+    to perform before every simulation step (performed by the driver, see
+    Simulation and AsyncDriver.py) and returns the metrics.
+    """
     #Define Params
     seed, adaptation_cycle, adaptation_green, green_thresh, adaptation_offset, offset_thresh,alpha, Changetime, Thresholdtime = params
     #Add Randomness
     random.seed(seed)
     np.random.seed(seed)
-    #Create Local Variables
-    veh_routes = {}
-    veh_classes = {}
-    df_current_status = None
-    df_hidden_vehicles = None
-    tracked_vehiclesIN = {}
-    last_vehicles_average = None
-    vehicle_waiting_times_average = {}
-    last_vehicles_total = set()
-    vehicle_departure_times = {}
+    #Controller of this Run
+    if ctx.controller is None:
+        ctx.controller = CONTROL_MODE
+    #Profiling (no-op profiler if disabled)
+    profiler = Profiler.NULL_PROFILER
+    if PROFILING:
+        Profiler.install_traci_counters()
+        profiler = ctx.profiler = Profiler.StepProfiler()
+    Profiler.activate(ctx.profiler)
+    signal_controllers = ctx.signal_controllers
     #Introduce Junctions and Initial Values for Variables
     JUNCTION_IDS = [c.intersection_name for c in signal_controllers]
     lanes = {}
     for c in signal_controllers:
         lanes[c.intersection_name] = [lane for group in c.links.values() for lane in group]
-    step = 0
     greentimes = {
         "intersection1": [27, 27, 27],     # phases: 0, 2, 4
         "intersection2": [38, 6, 37],      # phases: 0, 2, 4
@@ -256,135 +328,224 @@ def Simulation(params):
     queue_lengths = 0
     last_cycle_update = -90
     ################################
-    # Launch SUMO
-    traci.start([
-        SUMO_BINARY,
-        "-c", "../model/Configuration.sumocfg",
-        "--quit-on-end",
-        "--start",
-        "--time-to-teleport", "-1",
-        "--waiting-time-memory", "6000"
-    ])
-    
     # Load Vehicle Spawn Data
-    df_veh_spawn = pd.read_csv("../model/Spawn_Vehicles.csv")
-    df_veh_spawn = df_veh_spawn.rename(columns={"Unnamed: 0": "veh_ctr"})
-    df_bus_spawn = pd.read_csv("../model/Spawn_Bus.csv")
-    df_bus_spawn = df_bus_spawn.rename(columns={"Unnamed: 0": "veh_ctr"})
+    sumo_args = []
+    if DEMAND_MODE == "COMPILED":
+        route_file = compile_demand(seed, "../model/Spawn_Vehicles.csv", "../model/Spawn_Bus.csv",
+                                    START_TIME, SIMULATION_DURATION, BUS_STOP_DURATION, DEMAND_CACHE_DIR)
+        sumo_args = ["--route-files", "../model/CarRoutes.rou.xml,"+route_file]
+    else:
+        veh_spawn_schedule = compile_spawn_schedule("../model/Spawn_Vehicles.csv", START_TIME, SIMULATION_DURATION)
+        bus_spawn_schedule = compile_spawn_schedule("../model/Spawn_Bus.csv", START_TIME, SIMULATION_DURATION)
+    veh_ctr = 0
+    
+    # Warm-Up Snapshot (the warm-up runs with WARMUP_CONTROLLER, then ctx.controller takes over)
+    control_mode = ctx.controller
+    control_start = 0
+    start_step = 0
+    use_snapshot = WARMUP_SNAPSHOTS and WARMUP_CONTROLLER in SNAPSHOT_CONTROLLERS
+    if WARMUP_SNAPSHOTS and not use_snapshot:
+        print(f">> No snapshots for warm-up controller {WARMUP_CONTROLLER}, simulating the warm-up", flush=True)
+    if use_snapshot:
+        control_mode = WARMUP_CONTROLLER
+        demand_hash = get_demand_hash(seed, "../model/Spawn_Vehicles.csv", "../model/Spawn_Bus.csv",
+                                      START_TIME, SIMULATION_DURATION, BUS_STOP_DURATION)
+        state_file, tracker_file = get_snapshot_files(SNAPSHOT_CACHE_DIR, seed, demand_hash, DEMAND_MODE,
+                                                      WARMUP_CONTROLLER, WARMUP_DURATION)
+        sumo_args += SNAPSHOT_SUMO_ARGS
+        if snapshot_exists(state_file, tracker_file):
+            trackers = load_snapshot_trackers(tracker_file)
+            veh_ctr = trackers["veh_ctr"]
+            np.random.set_state(trackers["np_random"])
+            random.setstate(trackers["random"])
+            for controller, controller_state in zip(signal_controllers, trackers["max_pressure"]):
+                controller.__dict__.update(controller_state)
+            sumo_args += ["--load-state", state_file]
+            start_step = WARMUP_DURATION
+    
+    # Launch SUMO (or reset the open instance)
+    launch_sumo(ctx, sumo_args)
+    subscribe_waiting_time_lanes(ctx, lanes)
     
     # Initialize Max Pressure
-    if CONTROL_MODE=="MAX_PRESSURE":
+    if control_mode=="MAX_PRESSURE" and start_step == 0:
         for controller in signal_controllers:
             controller.current_gt_start = traci.simulation.getTime()
-            
-    # Recorder
-    veh_routes = {}
-    veh_classes = {}
     
     # Run Simulation
-    veh_ctr = 0
-    
-    for current_time in SIMULATION_TIMES:
+    watchdog = GridlockWatchdog() if GRIDLOCK_WATCHDOG else None
+    for step in range(start_step, SIMULATION_DURATION+1):
+        profiler.lap("simulation_step")
+        #Save or Resume Warm-Up Snapshot and Hand Over to the Controller
+        if use_snapshot and step == WARMUP_DURATION:
+            if step != start_step:
+                trackers = {"veh_ctr": veh_ctr,
+                            "np_random": np.random.get_state(), "random": random.getstate(),
+                            "max_pressure": [controller.__dict__.copy() for controller in signal_controllers]}
+                save_snapshot(state_file, tracker_file, trackers)
+                # Continue from the saved state, as every run resuming from the snapshot does
+                traci.simulation.loadState(state_file)
+            subscribe_vehicles(traci.vehicle.getIDList())
+            subscribe_waiting_time_lanes(ctx, lanes)
+            if control_mode != ctx.controller:
+                control_mode = ctx.controller
+                control_start = step
+                last_cycle_update = step - cyclelength
+                if control_mode=="MAX_PRESSURE":
+                    for controller in signal_controllers:
+                        controller.current_gt_start = traci.simulation.getTime()
+            profiler.lap("snapshot")
         #Update Vehicles
-        df_current_status, df_hidden_vehicles = determine_current_state()
+        vehicle_state, hidden_by_edge = determine_current_state(ctx, control_mode)
+        profiler.lap("determine_current_state")
+        #Abort Gridlocked Runs
+        if watchdog is not None:
+            ctx.gridlock = watchdog.check(step, vehicle_state)
+            if ctx.gridlock is not None:
+                break
         #Initialize and Update Controllers
-        if CONTROL_MODE == "SCOSCA":
+        if control_mode == "SCOSCA":
             if step == last_cycle_update + cyclelength:
-                queue_lengths = get_queue_lengths(lanes, up_stream_links, df_hidden_vehicles)
-                cyclelength,greentimes = setup_scosca_control(queue_lengths,DS, step,
+                queue_lengths = get_queue_lengths(lanes, up_stream_links, hidden_by_edge)
+                cyclelength,greentimes = setup_scosca_control(ctx, queue_lengths,DS, step,
                                              adaptation_cycle, adaptation_green, green_thresh,
                                              adaptation_offset, offset_thresh,
                                              greentimes,cyclelength)
                 last_cycle_update = step
-            DS = calculate_degree_of_saturation_SCATS(greentimes, cyclelength, step, JUNCTION_IDS, lanes)
-        elif CONTROL_MODE == "SCOSCAFAIRV1":
+            DS = calculate_degree_of_saturation_SCATS(ctx, greentimes, cyclelength, step-control_start, JUNCTION_IDS, lanes,
+                                                      step == last_cycle_update)
+        elif control_mode == "SCOSCAFAIRV1":
             if step == last_cycle_update + cyclelength:
-                queue_lengths = get_queue_lengths(lanes, up_stream_links, df_hidden_vehicles)
-                cyclelength, greentimes = setup_scoscafairv1_control(queue_lengths,DS,waiting_times, step,
+                queue_lengths = get_queue_lengths(lanes, up_stream_links, hidden_by_edge)
+                cyclelength, greentimes = setup_scoscafairv1_control(ctx, queue_lengths,DS,waiting_times, step,
                                              adaptation_cycle, adaptation_green, green_thresh,
                                              adaptation_offset, offset_thresh,
                                              greentimes,cyclelength,alpha)
                 last_cycle_update = step
-            waiting_times = get_waiting_times(cyclelength, lanes, up_stream_links, df_hidden_vehicles)
-            DS = calculate_degree_of_saturation_SCATS(greentimes, cyclelength, step, JUNCTION_IDS, lanes)
-        elif CONTROL_MODE == "SCOSCAFAIRV2":
+            waiting_times = get_waiting_times(ctx, cyclelength, lanes, up_stream_links, hidden_by_edge, vehicle_state,
+                                              WAITING_TIME_MODE, WAITING_TIME_VALIDATION, step == last_cycle_update)
+            DS = calculate_degree_of_saturation_SCATS(ctx, greentimes, cyclelength, step-control_start, JUNCTION_IDS, lanes,
+                                                      step == last_cycle_update)
+        elif control_mode == "SCOSCAFAIRV2":
             if step == last_cycle_update + cyclelength:
-                queue_lengths = get_queue_lengths(lanes, up_stream_links, df_hidden_vehicles)
-                cyclelength,greentimes = setup_scoscafairv2_control(queue_lengths,DS, step,
+                queue_lengths = get_queue_lengths(lanes, up_stream_links, hidden_by_edge)
+                cyclelength,greentimes = setup_scoscafairv2_control(ctx, queue_lengths,DS, step,
                                                  adaptation_cycle, adaptation_green, green_thresh,
                                                  adaptation_offset, offset_thresh, Changetime,
                                                  greentimes,cyclelength)
                 last_cycle_update = step
-            DS = calculate_degree_of_saturation_SCATS(greentimes, cyclelength, step, JUNCTION_IDS, lanes)
-            Optimizer_Fairness(Changetime, Thresholdtime,greentimes)
-        elif CONTROL_MODE=="MAX_PRESSURE":
-            #Set Trafficlights for Max Pressure
+            DS = calculate_degree_of_saturation_SCATS(ctx, greentimes, cyclelength, step-control_start, JUNCTION_IDS, lanes,
+                                                      step == last_cycle_update)
+            Optimizer_Fairness(ctx, Changetime, Thresholdtime,greentimes, step == last_cycle_update)
+        elif control_mode=="MAX_PRESSURE":
+            #Set Trafficlights for Max Pressure (all pressures 0, as in the published results)
             for controller in signal_controllers:
-                controller.do_signal_logic()
+                controller.do_signal_logic(None)
+        profiler.lap("controller")
                 
         #Update Metrics
-        if step >= 1800:
-            throughput += get_throughput(lanes,step)
-            flow += get_flow()
-            TD += get_total_distance()
-            delay_t,veh_t,delay_s,veh_s,delay_m,veh_m = get_average_delay_total()
-            density += get_density()
+        if step >= WARMUP_DURATION:
+            throughput += get_throughput(ctx, lanes,step,WARMUP_DURATION)
+            flow_t,TD_t,TTT_t,delay_t,veh_t,delay_s,veh_s,delay_m,veh_m,density_t = get_metrics(ctx, step, vehicle_state, WARMUP_DURATION, STREAMING_GINI, DELAY_SPILL)
+            flow += flow_t
+            TD += TD_t
+            density += density_t
             delay_total += delay_t
             delay_sideroad += delay_s
             delay_mainroad += delay_m
             veh_total += veh_t
             veh_sideroad += veh_s
             veh_mainroad += veh_m
-            TTT += get_total_travel_time(step)
+            TTT += TTT_t
+        profiler.lap("metrics")
     
-        #Spawn Vehicles
-        for idx, row in df_veh_spawn[df_veh_spawn["Adjusted_Datetime"]==current_time].iterrows():
-            for x in range(0, int(np.ceil(row["n_spawn"]))):
+        #Spawn Vehicles and Buses (compiled demand is loaded by SUMO)
+        if DEMAND_MODE == "RUNTIME":
+            for row in veh_spawn_schedule.rows(step):
+                for x in range(0, veh_spawn_schedule.counts[row]):
+                    veh_ctr += 1
+                    spawn_random_vehicle(veh_ctr, desired_route=veh_spawn_schedule.routes[row])
+            for row in bus_spawn_schedule.rows(step):
                 veh_ctr += 1
-                spawn_random_vehicle(veh_ctr, desired_route=str(row["route"]))
-                
-        #Spawn Buses
-        for idx, row in df_bus_spawn[df_bus_spawn["Adjusted_Datetime"]==current_time].iterrows():
-            veh_ctr += 1
-            spawn_random_bus(veh_ctr, desired_route=str(row["route"]), stops=str(row["Stops"]))
+                spawn_random_bus(veh_ctr, desired_route=bus_spawn_schedule.routes[row], stops=bus_spawn_schedule.stops[row])
+        profiler.lap("spawning")
             
         #Simulate for One Step
-        for n in range(0,SIMULATION_STEPS_PER_SECOND):
-            traci.simulationStep()
+        yield SIMULATION_STEPS_PER_SECOND
         if DEBUG_GUI:
             time.sleep(SIMULATION_WAIT_TIME)
-    
-        step += 1
         
-    #Make Final Metric Calculations
-    avg_delay = delay_total/veh_total
-    avg_delay_sideroad = delay_sideroad/veh_sideroad
-    avg_delay_mainroad = delay_mainroad/veh_mainroad
-    avg_density = density/SIMULATION_DURATION
-    avg_speed = TD/TTT
-    gini = get_gini()
-    max_delay = get_max_delay()
+    #Make Final Metric Calculations (penalty metrics for gridlocked runs)
+    if ctx.gridlock is not None:
+        # Notice on stderr, Output.txt (stdout) only contains the metrics
+        print(f"GRIDLOCK AT STEP {step}: {ctx.gridlock} (run aborted, penalty metrics returned)",file=sys.stderr,flush=True)
+        metrics = GRIDLOCK_PENALTY
+    else:
+        avg_delay = delay_total/veh_total
+        avg_delay_sideroad = delay_sideroad/veh_sideroad
+        avg_delay_mainroad = delay_mainroad/veh_mainroad
+        avg_density = density/SIMULATION_DURATION
+        avg_speed = TD/TTT
+        gini = get_gini(ctx)
+        max_delay = get_max_delay(ctx)
+        metrics = (throughput,flow,avg_speed,avg_density,avg_delay,avg_delay_sideroad,
+                   avg_delay_mainroad,max_delay, TTT,gini[0],gini[1],gini[2])
     
     #Print Metrics
-    print(f"THROUGHPUT: {throughput}",flush=True)
-    print(f"FLOW: {flow}",flush=True)
-    print(f"AVG SPEED: {avg_speed}",flush=True)
-    print(f"DENSITY: {avg_density}",flush=True)
-    print(f"AVG DELAY: {avg_delay}",flush=True)
-    print(f"AVG. DELAY SIDEROAD: {avg_delay_sideroad}",flush=True)
-    print(f"AVG. DELAY MAINROAD: {avg_delay_mainroad}",flush=True)
-    print(f"MAX DELAY: {max_delay}",flush=True)
-    print(f"TOTAL TRAVEL TIME: {TTT}",flush=True)
-    print(f"GINI TOTAL: {gini[0]}",flush=True)
-    print(f"GINI SIDEROAD: {gini[1]}",flush=True)
-    print(f"GINI MAINROAD: {gini[2]}",flush=True)
+    print_metrics(metrics)
     
-    # Close SUMO
-    traci.close()
+    if DEBUG_DIAGNOSTICS:
+        skipped = ctx.skipped_observations / max(ctx.observations + ctx.skipped_observations, 1)
+        print(f"STEPS WITHOUT STATE VIEWS: {ctx.skipped_observations} ({skipped:.1%})", flush=True)
+        signal_plans = ctx.signal_plans.summary()
+        if signal_plans["cycles"] > 0:
+            print(f"SIGNAL PLAN UPLOADS: {signal_plans['uploads']} (unchanged: {signal_plans['unchanged']}), "
+                  f"TRACI CALLS PER CYCLE: {signal_plans['traci_calls_per_cycle']:.1f}", flush=True)
+    
+    # Save Profile
+    if ctx.profiler is not None:
+        ctx.profiler.save(PROFILE_FILE.format(controller=ctx.controller, seed=seed),
+                          controller=ctx.controller, seed=seed, steps=step+1-start_step,
+                          observations=ctx.observations, skipped_observations=ctx.skipped_observations,
+                          signal_plans=ctx.signal_plans.summary(),
+                          backend=SUMO_BACKEND)
+        Profiler.activate(None)
+    
+    # Close SUMO (persistent instances stay open for the next run)
+    if ctx.label is not None:
+        traci.close()
+    elif not PERSISTENT_SUMO:
+        close_sumo()
     
     #Return Metrics to Optimizer
-    return (throughput,flow,avg_speed,avg_density,avg_delay,avg_delay_sideroad,
-            avg_delay_mainroad,max_delay, TTT,gini[0],gini[1],gini[2])
+    return metrics
+
+def Simulation(params, ctx=None):
+    """
+    Runs one simulation and returns the metrics.
+    """
+    #Create Simulation Context (state of this run)
+    if ctx is None:
+        ctx = SimulationContext()
+    #Consult Result Cache
+    result_file = get_result_cache_file(params, ctx)
+    if result_file is not None:
+        metrics = load_result(result_file)
+        if metrics is not None:
+            print(f">> Result from cache: {result_file}", file=sys.stderr, flush=True)
+            print_metrics(metrics)
+            return metrics
+    #Run Simulation
+    steps = simulate(params, ctx)
+    try:
+        while True:
+            for n in range(0, next(steps)):
+                traci.simulationStep()
+    except StopIteration as stop:
+        metrics = stop.value
+    if result_file is not None:
+        save_result(result_file, metrics)
+    return metrics
 
 """
 # #############################################################################
@@ -0,0 +1,131 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the signal plan manager of the SCOSCA controllers. It
+    caches the plan last uploaded to every junction, so that a program logic is
+    only uploaded with setProgramLogic when its phase durations changed, and it
+    applies the offsets with a cumulative phase table. The TraCI calls and
+    uploads are counted per cycle.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import bisect
+import traci
+from traci import constants as tc
+
+
+
+
+# #############################################################################
+# ###### GLOBAL VARIABLES #####################################################
+# #############################################################################
+YELLOW_DURATION = 3 # Fixed yellow duration after every green phase
+
+
+
+
+# #############################################################################
+# ###### SIGNAL PLAN MANAGER ##################################################
+# #############################################################################
+class SignalPlanManager:
+    def __init__(self):
+        self.plans = {} # Phase durations last uploaded per junction
+        self.offset_tables = {} # Cumulative phase ends per green times
+        self.cycles = [] # TraCI calls and uploads per cycle
+        self.cycle = None
+
+    def begin_cycle(self):
+        """
+        Starts counting the TraCI calls and uploads of a new cycle.
+        """
+        self.cycle = {"uploads": 0, "unchanged": 0, "traci_calls": 0}
+        self.cycles.append(self.cycle)
+
+    def upload(self, junction, program_id, greens, green_states, yellow_states):
+        """
+        Uploads the program logic (green and yellow phases) of a junction,
+        unless the junction already runs a plan with the same durations.
+        Returns whether the logic was uploaded.
+        """
+        durations = tuple(greens)
+        if self.plans.get(junction) == durations:
+            self.cycle["unchanged"] += 1
+            return False
+        phases = []
+        for idx, g_duration in enumerate(greens):
+            phases.append(traci.trafficlight.Phase(g_duration, green_states[idx]))
+            phases.append(traci.trafficlight.Phase(YELLOW_DURATION, yellow_states[idx]))
+        logic = traci.trafficlight.Logic(
+            programID=program_id,
+            type=tc.TRAFFICLIGHT_TYPE_STATIC,
+            currentPhaseIndex=0,
+            phases=phases
+        )
+        traci.trafficlight.setProgramLogic(junction, logic)
+        self.plans[junction] = durations
+        self.cycle["uploads"] += 1
+        self.cycle["traci_calls"] += 1
+        return True
+
+    def get_offset_table(self, greens):
+        """
+        Returns the cumulative ends of the phases counted backwards from the
+        cycle end (last yellow, last green, ..., at most three green phases).
+        """
+        durations = tuple(greens)
+        if durations not in self.offset_tables:
+            ends = []
+            total = 0
+            for g_duration in durations[::-1][:3]:
+                for duration in [YELLOW_DURATION, g_duration]:
+                    total += duration
+                    ends.append(total)
+            self.offset_tables[durations] = ends
+        return self.offset_tables[durations]
+
+    def apply_offset(self, junction, greens, shift):
+        """
+        Shifts the plan of a junction by the offset (seconds before the cycle
+        end), returns the phase that was set or None if the offset exceeds the
+        cycle (the junction then restarts at phase 0).
+        """
+        if shift == 0:
+            traci.trafficlight.setPhase(junction, 0)
+            self.cycle["traci_calls"] += 1
+            return 0
+        ends = self.get_offset_table(greens)
+        k = bisect.bisect_right(ends, shift)
+        if k == len(ends):
+            traci.trafficlight.setPhase(junction, 0)
+            self.cycle["traci_calls"] += 1
+            return None
+        phase = len(greens)*2-1-k
+        traci.trafficlight.setPhase(junction, phase)
+        traci.trafficlight.setPhaseDuration(junction, shift - (ends[k-1] if k > 0 else 0))
+        self.cycle["traci_calls"] += 2
+        return phase
+
+    def summary(self):
+        """
+        Summarizes the uploads and TraCI calls of all cycles so far.
+        """
+        cycles = len(self.cycles)
+        uploads = sum(cycle["uploads"] for cycle in self.cycles)
+        unchanged = sum(cycle["unchanged"] for cycle in self.cycles)
+        traci_calls = sum(cycle["traci_calls"] for cycle in self.cycles)
+        return {"cycles": cycles, "uploads": uploads, "unchanged": unchanged, "traci_calls": traci_calls,
+                "traci_calls_per_cycle": traci_calls / cycles if cycles > 0 else 0,
+                "per_cycle": self.cycles}
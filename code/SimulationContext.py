@@ -0,0 +1,102 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the simulation context, which holds the state of one
+    simulation run (vehicle trackers, measurements, controller states). Every
+    run creates its own context, so that one process can execute several
+    simulations back-to-back.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+from ControllerMaxPressure import create_signal_controllers
+from ControllerSCOSCA import phases_per_junction, PhaseIncidence
+from SignalPlan import SignalPlanManager
+
+
+
+
+# #############################################################################
+# ###### GLOBAL VARIABLES #####################################################
+# #############################################################################
+    # Initial previous cycle length (effective cycle, used for proportional adjustments)
+INITIAL_PREV_CYCLE_LENGTH = {"intersection1": 81,
+                             "intersection2": 81,
+                             "intersection3": 81,
+                             "intersection4": 84,
+                             "intersection5": 81}
+
+
+
+
+# #############################################################################
+# ###### SIMULATION CONTEXT ###################################################
+# #############################################################################
+class SimulationContext:
+    def __init__(self, controller=None, label=None):
+        # Run
+        self.controller = controller # Controller of this run (RunSimulation.CONTROL_MODE if None)
+        self.label = label # TraCI connection label (None: default connection)
+        self.route_edges = {} # Edges per route (routes do not change during the run)
+        # Detectors
+        self.lane_to_detector = {}
+        self.detector_lanes = {}
+        self.detector_multiplicity = {}
+        self.detector_positions = {}
+        self.detector_phase_served = {}
+        self.detector_ids = []
+        # Degree of saturation (SCATS)
+        self.runde = 0
+        self.DS_SCATS = {}
+        self.T_NO = {}
+        self.greentime = {}
+        self.vehicles_count = {}
+        self.detected_vehicles = {}
+        # Waiting times (FairSCOSCA_1)
+        self.waiting_times = {}
+        self.waiting_times_shadow = {}
+        self.waiting_times_validation = [] # (waiting_times, waiting_times_shadow) per cycle
+        # Metrics
+        self.tracked_vehiclesIN = {}
+        self.last_vehicle_state = None
+        self.arrived_delays = None # DelayLog per road (total, sideroad, mainroad)
+        self.delay_estimators = None # StreamingGini per road (STREAMING_GINI)
+        # SCOSCA controllers
+        self.update_counter = 0
+        self.prev_cycle_length = dict(INITIAL_PREV_CYCLE_LENGTH)
+        self.offsets = {}
+        self.signal_plans = SignalPlanManager() # Uploaded plans and TraCI calls per cycle
+        self.phase_incidence = PhaseIncidence(phases_per_junction)
+        # FairSCOSCA_2 controller
+        self.lanes_to_det = None
+        self.red_lanes = {} # Red lanes with detector per (junction, phase)
+        self.begin_phase = {}
+        self.early_switched = {}
+        self.done_earlier = {}
+        self.phase_of_lane = {}
+        self.ChangeOne = {}
+        self.remainingtime = {}
+        # SUMO startup (instrumentation)
+        self.startup_mode = None # "start" (new SUMO instance) or "load" (reset with traci.load)
+        self.startup_time = None
+        # State views (steps with and without building them)
+        self.observations = 0
+        self.skipped_observations = 0
+        # Gridlock watchdog
+        self.gridlock = None # Reason the run was aborted (see Watchdog.py)
+        # Profiling (see Profiler.py, None if disabled)
+        self.profiler = None
+        # Max Pressure controllers
+        self.signal_controllers = create_signal_controllers()
@@ -0,0 +1,86 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the warm-up snapshots: the SUMO state at the end of
+    the warm-up (saveState/loadState) together with the Python-side trackers,
+    cached per seed, demand and warm-up controller, so that simulations can
+    resume at the first metered step instead of simulating the warm-up again.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import pickle
+import hashlib
+import traci
+
+
+
+
+# #############################################################################
+# ###### SNAPSHOT PARAMETER ###################################################
+# #############################################################################
+    # Warm-up controllers without parameters (snapshots are independent of the candidate)
+SNAPSHOT_CONTROLLERS = ["FIXED_CYCLE", "MAX_PRESSURE"]
+    # Version of the warm-up (increase when the warm-up controllers change)
+SNAPSHOT_VERSION = 4
+    # Options needed to save and restore the state exactly
+SNAPSHOT_SUMO_ARGS = ["--save-state.rng", "--save-state.precision", "17"]
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def get_snapshot_files(snapshot_dir, seed, demand_hash, demand_mode, warmup_controller, warmup_duration):
+    """
+    Returns the state file and the tracker file of a warm-up snapshot.
+    """
+    key = f"{SNAPSHOT_VERSION}|{seed}|{demand_hash}|{demand_mode}|{warmup_controller}|{warmup_duration}"
+    key = hashlib.sha256(key.encode()).hexdigest()[:16]
+    base = os.path.join(snapshot_dir, f"Snapshot_seed_{seed}_{warmup_controller}_{key}")
+    return base+".xml.gz", base+".pkl"
+
+
+def snapshot_exists(state_file, tracker_file):
+    """
+    Checks whether a complete snapshot exists (the tracker file is written last).
+    """
+    return os.path.isfile(state_file) and os.path.isfile(tracker_file)
+
+
+def save_snapshot(state_file, tracker_file, trackers):
+    """
+    Saves the SUMO state and the Python-side trackers (written atomically,
+    parallel simulations may save the same snapshot).
+    """
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    temp_state_file = state_file.replace(".xml.gz", f".{os.getpid()}.tmp.xml.gz")
+    traci.simulation.saveState(temp_state_file)
+    os.replace(temp_state_file, state_file)
+    temp_tracker_file = f"{tracker_file}.{os.getpid()}.tmp"
+    with open(temp_tracker_file, "wb") as f:
+        pickle.dump(trackers, f)
+    os.replace(temp_tracker_file, tracker_file)
+
+
+def load_snapshot_trackers(tracker_file):
+    """
+    Loads the Python-side trackers of a snapshot.
+    """
+    with open(tracker_file, "rb") as f:
+        return pickle.load(f)
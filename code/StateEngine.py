@@ -0,0 +1,177 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the vehicle state engine, which acquires the state of
+    all vehicles in the network with TraCI variable subscriptions (one batched
+    call per simulation step instead of several calls per vehicle).
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import traci
+from traci import constants as tc
+import pandas as pd
+import numpy as np
+from Demand import vehicle_classes_of_types
+
+
+
+
+# #############################################################################
+# ###### GLOBAL VARIABLES #####################################################
+# #############################################################################
+    # Variables subscribed for every vehicle once it departs
+VEHICLE_VARIABLES = [tc.VAR_LANE_ID, tc.VAR_ROUTE_ID, tc.VAR_ROUTE_INDEX,
+                     tc.VAR_SPEED, tc.VAR_WAITING_TIME, tc.VAR_ACCUMULATED_WAITING_TIME,
+                     tc.VAR_DISTANCE, tc.VAR_DEPARTURE, tc.VAR_TYPE]
+    # Variables subscribed for lanes (lane-aggregate waiting times)
+LANE_VARIABLES = [tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+    # Variables subscribed for induction loops and traffic lights (degree of saturation, FairSCOSCA_2)
+DETECTOR_VARIABLES = [tc.LAST_STEP_VEHICLE_ID_LIST, tc.LAST_STEP_OCCUPANCY]
+TRAFFIC_LIGHT_VARIABLES = [tc.TL_CURRENT_PHASE, tc.TL_NEXT_SWITCH]
+    # Edges whose internal-lane vehicles are not counted as hidden vehicles
+EXCLUDED_EDGES = {"921020464#1","-331752492#0","38361907","26249185#30","183049933#0","758088375#0","-38361908#1",
+                  "-25973410#1","E3","-E1","-E4","22889927#0","-25576697#0","-22889927#2","-208691154#0",
+                  "E15","E10","E6"}
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def subscribe_vehicles(veh_ids):
+    """
+    Subscribes the state variables of the given vehicles.
+    """
+    for veh_id in veh_ids:
+        traci.vehicle.subscribe(veh_id, VEHICLE_VARIABLES)
+
+
+def subscribe_lanes(lane_ids):
+    """
+    Subscribes the state variables of the given lanes.
+    """
+    for lane_id in set(lane_ids):
+        traci.lane.subscribe(lane_id, LANE_VARIABLES)
+
+
+def acquire_lane_state():
+    """
+    Returns the state of all subscribed lanes {lane_id: {variable: value}}.
+    """
+    return traci.lane.getAllSubscriptionResults()
+
+
+def subscribe_detectors(detector_ids):
+    """
+    Subscribes the state variables of the given induction loops.
+    """
+    for detector_id in detector_ids:
+        traci.inductionloop.subscribe(detector_id, DETECTOR_VARIABLES)
+
+
+def acquire_detector_state():
+    """
+    Returns the state of all subscribed induction loops {detector_id: {variable: value}}.
+    """
+    return traci.inductionloop.getAllSubscriptionResults()
+
+
+def subscribe_traffic_lights(tls_ids):
+    """
+    Subscribes the state variables of the given traffic lights.
+    """
+    for tls_id in tls_ids:
+        traci.trafficlight.subscribe(tls_id, TRAFFIC_LIGHT_VARIABLES)
+
+
+def acquire_traffic_light_state():
+    """
+    Returns the state of all subscribed traffic lights {tls_id: {variable: value}}.
+    """
+    return traci.trafficlight.getAllSubscriptionResults()
+
+
+def clear_subscription_results():
+    """
+    Clears the subscription results after traci.load (traci only replaces
+    them with the next simulation step, so the results of the previous
+    simulation would be returned at the first step). A simulation step to a
+    time in the past performs no step, but replaces the results.
+    """
+    traci.simulationStep(-1)
+
+
+def get_route_edges(ctx, route_id):
+    """
+    Returns the edges of a route (cached per run in ctx.route_edges).
+    """
+    if route_id not in ctx.route_edges:
+        ctx.route_edges[route_id] = traci.route.getEdges(route_id)
+    return ctx.route_edges[route_id]
+
+
+def acquire_vehicle_state():
+    """
+    Subscribes vehicles that departed in the last step and returns the state
+    of all vehicles in the network {veh_id: {variable: value}}.
+    """
+    subscribe_vehicles(traci.simulation.getDepartedIDList())
+    return traci.vehicle.getAllSubscriptionResults()
+
+
+def get_current_lane(ctx, values):
+    """
+    Returns the lane of a vehicle, vehicles on internal lanes are assigned to
+    their current route edge as "@edge".
+    """
+    lane = values[tc.VAR_LANE_ID]
+    if not lane.startswith(":"):
+        return lane
+    return "@"+get_route_edges(ctx, values[tc.VAR_ROUTE_ID])[values[tc.VAR_ROUTE_INDEX]]
+
+
+def build_state_views(ctx, vehicle_state, weights=None):
+    """
+    Builds the vehicle status table (df_current_status) used by the Max
+    Pressure controllers from the subscribed vehicle state (the vehicle class
+    follows from the vehicle type, hidden vehicles have the lane "@edge").
+    """
+    if len(vehicle_state)==0:
+        print(">> NOTHING, so no state")
+        return None
+    current_vehicles = list(vehicle_state.keys())
+    current_lanes = [get_current_lane(ctx, values) for values in vehicle_state.values()]
+    df_current_status = pd.DataFrame(np.asarray([current_vehicles, current_lanes]).transpose(), columns=["veh_id", "lane"])
+    df_current_status["class"] = [vehicle_classes_of_types.get(values[tc.VAR_TYPE]) for values in vehicle_state.values()]
+    if weights is not None:
+        df_current_status["weight"] = df_current_status["class"].map(weights)
+    return df_current_status
+
+
+def get_hidden_vehicles_by_edge(ctx, vehicle_state):
+    """
+    Indexes the hidden vehicles (on internal lanes, assigned to their current
+    route edge) by edge {edge: [veh_id, ...]}, excluded edges are skipped.
+    """
+    hidden_by_edge = {}
+    for veh_id, values in vehicle_state.items():
+        if values[tc.VAR_LANE_ID].startswith(":"):
+            edge = get_route_edges(ctx, values[tc.VAR_ROUTE_ID])[values[tc.VAR_ROUTE_INDEX]]
+            if edge not in EXCLUDED_EDGES:
+                hidden_by_edge.setdefault(edge, []).append(veh_id)
+    return hidden_by_edge
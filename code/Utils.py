@@ -18,8 +18,14 @@
 # #############################################################################
 # ###### IMPORTS ##############################################################
 # #############################################################################
+import os
+import copy
+import tempfile
 import traci
+from traci import constants as tc
 import numpy as np
+from StateEngine import (get_route_edges, acquire_lane_state, subscribe_detectors, acquire_detector_state,
+                         subscribe_traffic_lights, acquire_traffic_light_state)
 
 
 
@@ -27,25 +33,7 @@ import numpy as np
 # #############################################################################
 # ###### GLOBAL VARIABLES #####################################################
 # #############################################################################
-# Global Variables
-DS_SCATS = {}
-runde = 0
-T_NO = {}
-T_NO_LAST = {}
-greentime = {}
-vehicles_count = {}
-detected_vehicles = {}
-lane_to_detector = {}
-tracked_vehiclesIN = {}
-last_vehicles_average = set()
-last_vehicles_total = set()
-vehicle_departure_times = {}
-vehicle_waiting_times_average = {}
-vehicle_waiting_times_average_sideroad = {}
-vehicle_waiting_times_average_mainroad = {}
-vehicle_departure_lanes = {}
-waiting_times = {}
-dist = {}
+# Global Variables (the state of a run is kept in its SimulationContext)
 sideroad_lanes = set([
     '-183419042#1','-208691154#0','-25576697#0','-25973410#1','-E16',
     '283020993#1','758088375#0','-1169441386','-23999291#1','1162834479#1',
@@ -122,15 +110,96 @@ lane_to_phases = {
 
 
 
+# #############################################################################
+# ###### STREAMING GINI #######################################################
+# #############################################################################
+class StreamingGini:
+    """
+    Bounded-memory Gini coefficient: values are counted in a histogram with
+    bins of width bin_width, so memory grows with the largest value and not
+    with the number of values. Exact for values on the bin grid (delays in
+    whole seconds with bin_width 1), otherwise values are rounded to it.
+    """
+    def __init__(self, bin_width=1.0):
+        self.bin_width = bin_width
+        self.counts = np.zeros(1024, dtype=np.int64)
+        self.n = 0
+        self.max_value = np.nan
+
+    def add(self, value):
+        b = int(round(value / self.bin_width))
+        if b >= len(self.counts):
+            self.counts = np.concatenate((self.counts, np.zeros(max(len(self.counts), b+1-len(self.counts)), dtype=np.int64)))
+        self.counts[b] += 1
+        self.n += 1
+        self.max_value = value if self.n == 1 else max(self.max_value, value)
+
+    def copy(self):
+        estimator = StreamingGini(self.bin_width)
+        estimator.counts = self.counts.copy()
+        estimator.n = self.n
+        estimator.max_value = self.max_value
+        return estimator
+
+    def gini(self):
+        if self.n == 0:
+            return np.nan
+        values = np.arange(len(self.counts)) * self.bin_width
+        counts_below = np.cumsum(self.counts) - self.counts
+        weighted_ranks = self.counts * (2 * counts_below + self.counts - self.n)
+        return np.sum(values * weighted_ranks) / (self.n * np.sum(values * self.counts))
+
+
+class DelayLog:
+    """
+    Delays of the arrived vehicles in a typed array (8 bytes per vehicle
+    instead of a dict entry per vehicle id). With spill, full chunks are
+    written to a temporary file, so that memory stays bounded in long
+    (all-day) simulations.
+    """
+    def __init__(self, spill=False, chunk_size=65536):
+        self.buffer = np.empty(chunk_size if spill else 1024)
+        self.n = 0
+        self.spill = spill
+        self.spill_file = None
+        self.n_spilled = 0
+
+    def append(self, value):
+        if self.n == len(self.buffer):
+            if self.spill:
+                if self.spill_file is None:
+                    self.spill_file = tempfile.TemporaryFile()
+                self.buffer.tofile(self.spill_file)
+                self.n_spilled += self.n
+                self.n = 0
+            else:
+                self.buffer = np.concatenate((self.buffer, np.empty(len(self.buffer))))
+        self.buffer[self.n] = value
+        self.n += 1
+
+    def __len__(self):
+        return self.n_spilled + self.n
+
+    def values(self):
+        if self.spill_file is None:
+            return self.buffer[:self.n].copy()
+        self.spill_file.seek(0)
+        spilled = np.fromfile(self.spill_file, dtype=float, count=self.n_spilled)
+        self.spill_file.seek(0, os.SEEK_END)
+        return np.concatenate((spilled, self.buffer[:self.n]))
+
+
+
+
 # #############################################################################
 # ###### METHODS ##############################################################
 # #############################################################################
 
-def get_lane_detectors():
+def get_lane_detectors(ctx):
     """
     Maps each lane to its corresponding detector.
     """
-    global lane_to_detector
+    lane_to_detector = ctx.lane_to_detector
     all_detectors = traci.inductionloop.getIDList()
     for detector_id in all_detectors:
         lane_id = traci.inductionloop.getLaneID(detector_id)
@@ -139,65 +208,97 @@ def get_lane_detectors():
     return lane_to_detector
 
 
-def calculate_degree_of_saturation_SCATS(greentimes, cyclelength, step, JUNCTION_IDS, lanes):
+def build_detector_index(ctx, JUNCTION_IDS, lanes):
     """
-    Calculates the degree of saturation (DS) similar to SCATS.
+    Indexes the detector lanes per junction (in the order of lanes[junction],
+    duplicate lanes once with their multiplicity), their position in the
+    detector subscription and the phases serving them.
+    """
+    lane_to_detector = ctx.lane_to_detector
+    detector_ids = sorted(set(lane_to_detector.values()))
+    position = {detector: i for i, detector in enumerate(detector_ids)}
+    detector_lanes = {}
+    detector_multiplicity = {}
+    detector_positions = {}
+    detector_phase_served = {}
+    for junction in JUNCTION_IDS:
+        junction_lanes = [lane for lane in lanes[junction] if lane in lane_to_detector]
+        detector_lanes[junction] = list(dict.fromkeys(junction_lanes))
+        detector_multiplicity[junction] = np.array([junction_lanes.count(lane) for lane in detector_lanes[junction]], dtype=int)
+        detector_positions[junction] = np.array([position[lane_to_detector[lane]] for lane in detector_lanes[junction]], dtype=int)
+        phases = [lane_to_phases[junction][lane] for lane in detector_lanes[junction]]
+        n_phases = max([p for lane_phases in phases for p in lane_phases], default=-1) + 1
+        detector_phase_served[junction] = np.array([[p in lane_phases for lane_phases in phases] for p in range(n_phases)], 
+                                                   dtype=bool).reshape(n_phases, len(phases))
+    ctx.detector_ids = detector_ids
+    ctx.detector_lanes = detector_lanes
+    ctx.detector_multiplicity = detector_multiplicity
+    ctx.detector_positions = detector_positions
+    ctx.detector_phase_served = detector_phase_served
+    subscribe_detectors(detector_ids)
+    subscribe_traffic_lights(JUNCTION_IDS)
+
+
+def calculate_degree_of_saturation_SCATS(ctx, greentimes, cyclelength, step, JUNCTION_IDS, lanes, signals_changed=False):
+    """
+    Calculates the degree of saturation (DS) similar to SCATS. Detector
+    readings and phases come from subscriptions, phases are queried if the
+    signals were changed in this step (signals_changed).
     """
-    global runde, vehicles_count, T_NO, T_NO_LAST, greentime, DS_SCATS, detected_vehicles
     if step == 0:
-        runde = 0
-        get_lane_detectors()
-    if runde == 0:
-        T_NO = {}
-        greentime = {}
-        vehicles_count = {}
-        T_NO_LAST = {}
-        DS_SCATS = {}
-        detected_vehicles = {}
+        ctx.runde = 0
+        get_lane_detectors(ctx)
+        build_detector_index(ctx, JUNCTION_IDS, lanes)
+    detector_lanes, detector_ids = ctx.detector_lanes, ctx.detector_ids
+    detector_multiplicity, detector_positions = ctx.detector_multiplicity, ctx.detector_positions
+    detector_phase_served = ctx.detector_phase_served
+    if ctx.runde == 0:
+        ctx.T_NO = {}
+        ctx.greentime = {}
+        ctx.vehicles_count = {}
+        ctx.DS_SCATS = {}
+        ctx.detected_vehicles = {}
+    T_NO, greentime, vehicles_count = ctx.T_NO, ctx.greentime, ctx.vehicles_count
+    DS_SCATS, detected_vehicles = ctx.DS_SCATS, ctx.detected_vehicles
+    if ctx.runde == 0:
         for junction in JUNCTION_IDS:
-            greentime[junction] = {}
-            T_NO[junction] = {}
-            DS_SCATS[junction] = {}
-            T_NO_LAST[junction] = {}
-            vehicles_count[junction] = {}
-            detected_vehicles[junction] = {}
-            for lane in lanes[junction]:
-                if lane in lane_to_detector:
-                    vehicles_count[junction][lane] = 0
-                    T_NO_LAST[junction][lane] = 0
-                    detected_vehicles[junction][lane] = set()
-                    phases = lane_to_phases[junction][lane]
-                    greentime[junction][lane] = sum([greentimes[junction][p//2] for p in phases])
-                    T_NO[junction][lane] = greentime[junction][lane]
+            greentime[junction] = np.array([sum([greentimes[junction][p//2] for p in lane_to_phases[junction][lane]])
+                                            for lane in detector_lanes[junction]], dtype=float)
+            T_NO[junction] = greentime[junction].copy()
+            vehicles_count[junction] = np.zeros(len(detector_lanes[junction]), dtype=int)
+            detected_vehicles[junction] = [set() for lane in detector_lanes[junction]]
+    detector_state = acquire_detector_state()
+    occupancy = np.array([detector_state[detector][tc.LAST_STEP_OCCUPANCY] for detector in detector_ids], dtype=float) / 100
+    traffic_light_state = None if signals_changed else acquire_traffic_light_state()
     for junction in JUNCTION_IDS:
-        phase = traci.trafficlight.getPhase(junction)
-        for lane in lanes[junction]:
-            if lane in lane_to_detector:
-                detector = lane_to_detector[lane]
-                if phase in lane_to_phases[junction][lane]:
-                    current_vehicles = set(traci.inductionloop.getLastStepVehicleIDs(detector))
-                    new_vehicles = current_vehicles - detected_vehicles[junction][lane]
-                    occupancy = traci.inductionloop.getLastStepOccupancy(detector) / 100
-                    if occupancy > 0:
-                        T_NO[junction][lane] -= occupancy
-                        vehicles_count[junction][lane] += len(new_vehicles)
-                        detected_vehicles[junction][lane].update(new_vehicles)
-    if runde == cyclelength - 1:
+        if signals_changed:
+            phase = traci.trafficlight.getPhase(junction)
+        else:
+            phase = traffic_light_state[junction][tc.TL_CURRENT_PHASE]
+        if phase >= len(detector_phase_served[junction]):
+            continue
+        lane_occupancy = occupancy[detector_positions[junction]]
+        active = detector_phase_served[junction][phase] & (lane_occupancy > 0)
+        # Duplicate lanes are decremented once per occurrence
+        for k in range(detector_multiplicity[junction].max(initial=0)):
+            mask = active & (detector_multiplicity[junction] > k)
+            T_NO[junction][mask] -= lane_occupancy[mask]
+        for i in np.flatnonzero(active):
+            detector = detector_ids[detector_positions[junction][i]]
+            new_vehicles = set(detector_state[detector][tc.LAST_STEP_VEHICLE_ID_LIST]) - detected_vehicles[junction][i]
+            vehicles_count[junction][i] += len(new_vehicles)
+            detected_vehicles[junction][i].update(new_vehicles)
+    if ctx.runde == cyclelength - 1:
         for junction in JUNCTION_IDS:
-            for lane in lanes[junction]:
-                if lane in lane_to_detector:
-                    DS_SCATS[junction][lane] = max(
-                        (greentime[junction][lane] - (T_NO[junction][lane] - 1.87 * vehicles_count[junction][lane]))
-                        / greentime[junction][lane],
-                        0,
-                    )
-        runde = 0
+            ds = np.maximum((greentime[junction] - (T_NO[junction] - 1.87 * vehicles_count[junction])) / greentime[junction], 0)
+            DS_SCATS[junction] = dict(zip(detector_lanes[junction], ds.tolist()))
+        ctx.runde = 0
         return DS_SCATS
-    runde += 1
+    ctx.runde += 1
     return None
 
 
-def get_queue_lengths(lanes,up_stream_lanes, df_hidden_vehicles):
+def get_queue_lengths(lanes,up_stream_lanes, hidden_by_edge):
     """
     Tracks queue lengths per lane, including upstream contributions.
     """
@@ -208,11 +309,9 @@ def get_queue_lengths(lanes,up_stream_lanes, df_hidden_vehicles):
         for lane in lanes[j]:
             queue_lengths[j][lane] = 0
         # Add hidden vehicles based on internal edge location
-        if df_hidden_vehicles is not None and "edge" in df_hidden_vehicles.columns:
-            for lane in lanes[j]:
-                edge = lane.split("_")[0]
-                hidden_on_edge = df_hidden_vehicles[df_hidden_vehicles["edge"] == edge]
-                queue_lengths[j][lane] += len(hidden_on_edge)
+        for lane in lanes[j]:
+            edge = lane.split("_")[0]
+            queue_lengths[j][lane] += len(hidden_by_edge.get(edge, ()))
 
         # Add direct vehicles on every lane
         for lane in queue_lengths[j].keys():
@@ -225,14 +324,15 @@ def get_queue_lengths(lanes,up_stream_lanes, df_hidden_vehicles):
     return queue_lengths
 
 
-def get_throughput(lanes,step):
+def get_throughput(ctx, lanes,step,first_step=1800):
     """
     Tracks throughput for every controlled junction summed together.
     """
-    global tracked_vehiclesIN
+    tracked_vehiclesIN = ctx.tracked_vehiclesIN
+    lane_to_detector = ctx.lane_to_detector
     total_throughput = 0
-    if step==1800:
-        get_lane_detectors()
+    if step==first_step:
+        get_lane_detectors(ctx)
         for j in lanes.keys():
             for lane in lanes[j]:
                 if lane in lane_to_detector:
@@ -248,157 +348,199 @@ def get_throughput(lanes,step):
     return total_throughput
 
 
-def get_flow():
+def get_metrics(ctx, step, vehicle_state, first_step=1800, streaming_gini=False, spill_delays=False):
+    """
+    Tracks flow, total distance, total travel time, delays (total, sideroad,
+    mainroad) and density in one pass over the vehicles that arrived in the
+    last step, using their subscribed values of the previous step. Delays of
+    arrived vehicles are kept in DelayLogs (spilled to disk with
+    spill_delays), with streaming_gini in StreamingGini histograms instead.
+    """
+    if step==first_step:
+        ctx.last_vehicle_state = None
+        ctx.arrived_delays = None
+        ctx.delay_estimators = None
+        if streaming_gini:
+            ctx.delay_estimators = {"total": StreamingGini(), "sideroad": StreamingGini(), "mainroad": StreamingGini()}
+        else:
+            ctx.arrived_delays = {road: DelayLog(spill_delays) for road in ["total", "sideroad", "mainroad"]}
+    last_vehicle_state, delay_estimators, arrived_delays = ctx.last_vehicle_state, ctx.delay_estimators, ctx.arrived_delays
+    total_flow = 0
+    total_distance = 0
+    total_travel_time = 0
+    total_waiting_time = 0
+    vehicle_count = 0
+    total_waiting_time_sideroad = 0
+    vehicle_count_sideroad = 0
+    total_waiting_time_mainroad = 0
+    vehicle_count_mainroad = 0
+    if last_vehicle_state is not None:
+        for veh_id in traci.simulation.getArrivedIDList():
+            values = last_vehicle_state.get(veh_id)
+            if values is None:
+                continue
+            total_flow += 1
+            total_distance += values[tc.VAR_DISTANCE]
+            total_travel_time += step - values[tc.VAR_DEPARTURE]
+            wait_time = values[tc.VAR_ACCUMULATED_WAITING_TIME]
+            lane = get_route_edges(ctx, values[tc.VAR_ROUTE_ID])[0]
+            total_waiting_time += wait_time
+            vehicle_count += 1
+            if lane in sideroad_lanes:
+                total_waiting_time_sideroad += wait_time
+                vehicle_count_sideroad += 1
+            else:
+                total_waiting_time_mainroad += wait_time
+                vehicle_count_mainroad += 1
+            if delay_estimators is not None:
+                delay_estimators["total"].add(wait_time)
+                delay_estimators["sideroad" if lane in sideroad_lanes else "mainroad"].add(wait_time)
+            else:
+                arrived_delays["total"].append(wait_time)
+                arrived_delays["sideroad" if lane in sideroad_lanes else "mainroad"].append(wait_time)
+    ctx.last_vehicle_state = dict(vehicle_state) # traci clears its subscription results with every step
+    density = len(vehicle_state)
+    return (total_flow, total_distance, total_travel_time, 
+            total_waiting_time, vehicle_count, total_waiting_time_sideroad, 
+            vehicle_count_sideroad, total_waiting_time_mainroad, vehicle_count_mainroad, density)
+
+
+def get_vehicle_delays(ctx):
     """
-    Tracks network flow.
+    Delays of all vehicles seen while tracking (arrived vehicles and the
+    vehicles still in the network).
     """
-    global last_vehicles_total
-    current_vehicles = set(traci.vehicle.getIDList())
-    total_flow = len(last_vehicles_total - current_vehicles)
-    return total_flow
+    current_delays = []
+    if ctx.last_vehicle_state is not None:
+        current_delays = [values[tc.VAR_ACCUMULATED_WAITING_TIME] for values in ctx.last_vehicle_state.values()]
+    return np.concatenate((ctx.arrived_delays["total"].values(), np.asarray(current_delays, dtype=float)))
 
 
-def get_total_distance():
+def get_max_delay(ctx):
     """
-    Tracks the total distance (used for average speed).
+    Tracks Max Delay.
     """
-    global dist
-    total_distance = 0
-    current_veh = set(traci.vehicle.getIDList())
-    for veh_id in current_veh:
-        dist[veh_id] = traci.vehicle.getDistance(veh_id)
-    for veh_id in last_vehicles_total - current_veh:
-        total_distance += dist.pop(veh_id, 0)
-    return total_distance
+    if ctx.delay_estimators is not None:
+        return get_total_delay_estimator(ctx).max_value
+    max_delay = np.max(get_vehicle_delays(ctx))
+    return max_delay 
 
 
-def get_total_travel_time(step):
+def gini_coefficient(values):
     """
-    Tracks Total Travel Time.
+    Gini coefficient sum(|x_i - x_j|) / (2 n^2 mean), computed from the sorted
+    values in O(n log n) without the pairwise difference matrix.
     """
-    global last_vehicles_total, vehicle_departure_times
-    total_travel_time = 0  
-    current_vehicles = set(traci.vehicle.getIDList())
-    for veh_id in current_vehicles:
-        vehicle_departure_times[veh_id] = traci.vehicle.getDeparture(veh_id)
-    # Loop through all vehicles that left simulation
-    for veh_id in last_vehicles_total - current_vehicles:
-        total_travel_time += step - vehicle_departure_times.pop(veh_id,0)
-    last_vehicles_total = current_vehicles
-    #Return the total waiting time in this time step (waiting time of all vehicles that finished in this time step)
-    return total_travel_time
+    values = np.sort(np.asarray(values, dtype=float))
+    n = len(values)
+    if n == 0:
+        return np.nan
+    ranks = np.arange(1, n+1)
+    return np.sum((2 * ranks - n - 1) * values) / (n * np.sum(values))
 
 
-def get_density():
+def get_total_delay_estimator(ctx):
     """
-    Tracks Density.
+    Streaming estimator of the total delays including the vehicles still in
+    the network.
     """
-    return len(traci.vehicle.getIDList())
+    estimator = ctx.delay_estimators["total"].copy()
+    if ctx.last_vehicle_state is not None:
+        for values in ctx.last_vehicle_state.values():
+            estimator.add(values[tc.VAR_ACCUMULATED_WAITING_TIME])
+    return estimator
 
 
-def get_max_delay():
+def get_gini(ctx):
     """
-    Tracks Max Delay.
+    Tracks Gini coefficient of vehicle delays.
     """
-    max_delay = max(vehicle_waiting_times_average.values())
-    return max_delay 
+    if ctx.delay_estimators is not None:
+        return [get_total_delay_estimator(ctx).gini(), 
+                ctx.delay_estimators["sideroad"].gini(), ctx.delay_estimators["mainroad"].gini()]
+    return [gini_coefficient(get_vehicle_delays(ctx)), gini_coefficient(ctx.arrived_delays["sideroad"].values()),
+            gini_coefficient(ctx.arrived_delays["mainroad"].values())]
 
 
-def get_average_delay_total():
+def get_current_gini(ctx):
     """
-    Tracks all avgerage delays.
+    Gini coefficient of the delays of all vehicles arrived so far (can be
+    called at any step during the run).
     """
-    global last_vehicles_average, vehicle_waiting_times_average
-    global vehicle_departure_lanes, vehicle_waiting_times_average_mainroad
-    global vehicle_waiting_times_average_sideroad
-    total_waiting_time = 0
-    vehicle_count = 0
-    total_waiting_time_sideroad = 0
-    vehicle_count_sideroad = 0
-    total_waiting_time_mainroad = 0
-    vehicle_count_mainroad = 0
-    current_vehicles = set(traci.vehicle.getIDList())
-    for veh_id in current_vehicles:
-        vehicle_waiting_times_average[veh_id] = traci.vehicle.getAccumulatedWaitingTime(veh_id)
-        if veh_id not in vehicle_departure_lanes:
-            route = traci.vehicle.getRoute(veh_id)
-            if route:
-                vehicle_departure_lanes[veh_id] = route[0]
-    if last_vehicles_average is not None:
-        departed_vehicles = last_vehicles_average - current_vehicles
-        for veh_id in departed_vehicles:
-            wait_time = vehicle_waiting_times_average.get(veh_id, 0)
-            lane = vehicle_departure_lanes.get(veh_id)
-            total_waiting_time += wait_time
-            vehicle_count += 1
-            if lane in sideroad_lanes:
-                vehicle_waiting_times_average_sideroad[veh_id] = wait_time
-                total_waiting_time_sideroad += wait_time
-                vehicle_count_sideroad += 1
-            else:
-                vehicle_waiting_times_average_mainroad[veh_id] = wait_time
-                total_waiting_time_mainroad += wait_time
-                vehicle_count_mainroad += 1
-    last_vehicles_average = current_vehicles
-    return (total_waiting_time, vehicle_count, total_waiting_time_sideroad, 
-            vehicle_count_sideroad, total_waiting_time_mainroad, vehicle_count_mainroad) 
+    if ctx.delay_estimators is not None:
+        return [ctx.delay_estimators[road].gini() for road in ["total", "sideroad", "mainroad"]]
+    return [gini_coefficient(ctx.arrived_delays[road].values()) for road in ["total", "sideroad", "mainroad"]]
 
 
-def get_gini():
+def count_waiting_vehicles(lane, hidden_by_edge, vehicle_state, lane_state, mode):
     """
-    Tracks Gini coefficient of vehicle delays.
+    Counts the vehicles waiting on a lane, either checked per vehicle
+    ("VEHICLE") or as halting number of the lane ("LANE"). Hidden vehicles on
+    internal lanes are always checked per vehicle.
     """
-    total = np.array(list(vehicle_waiting_times_average.values()))
-    sideroad = np.array(list(vehicle_waiting_times_average_sideroad.values()))
-    mainroad = np.array(list(vehicle_waiting_times_average_mainroad.values()))
-    
-    L = [total, sideroad, mainroad]
-    gini_index = []
-    for i in L:
-        n = len(i)
-        mean_value = np.mean(i)
-        total_absolute_differences = np.sum(np.abs(i[:, None] - i))  # Pairwise differences
-        gini_index.append(total_absolute_differences / (2 * n**2 * mean_value))
-    return gini_index  
+    count = 0
+    # Add hidden vehicles based on internal edge location (subscribed state)
+    for veh in hidden_by_edge.get(lane.split("_")[0], ()):
+        values = vehicle_state[veh]
+        if values[tc.VAR_SPEED] < 0.1 and values[tc.VAR_WAITING_TIME] > 0:
+            count += 1
+    if mode == "LANE":
+        # Halting: speed < 0.1 (also includes buses halting at a bus stop)
+        return count + lane_state[lane][tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+    for veh_id in traci.lane.getLastStepVehicleIDs(lane):
+        values = vehicle_state[veh_id]
+        if values[tc.VAR_SPEED] < 0.1 and values[tc.VAR_WAITING_TIME] > 0:
+            count += 1
+    return count
+
+
+def add_upstream_waiting_times(waiting_times, up_stream_lanes):
+    """
+    Adds the waiting times of upstream lanes to their downstream lane.
+    """
+    for junction in up_stream_lanes.keys():
+        for down, ups in up_stream_lanes[junction].items():
+            for up in ups:
+                waiting_times[junction][down] += waiting_times[junction].get(up, 0)
 
 
-def get_waiting_times(cyclelength, lanes, up_stream_lanes, df_hidden_vehicles):
+def get_waiting_times(ctx, cyclelength, lanes, up_stream_lanes, hidden_by_edge, vehicle_state, mode="VEHICLE", validation_mode=None,
+                      signals_changed=False):
     """
     Calculates the waiting time per lane (sum of all waiting vehicles).
+    With a validation_mode, the waiting times of that mode are calculated
+    alongside and both are recorded per cycle in ctx.waiting_times_validation.
+    Phases come from the traffic light subscription (see
+    calculate_degree_of_saturation_SCATS), they are queried if the signals
+    were changed in this step (signals_changed).
     """
-    global waiting_times
-    if runde == 0:
+    waiting_times, waiting_times_shadow = ctx.waiting_times, ctx.waiting_times_shadow
+    if ctx.runde == 0:
         for junction in up_stream_lanes.keys():
             waiting_times[junction] = {}
+            waiting_times_shadow[junction] = {}
             for lane in lanes[junction]:
                 waiting_times[junction][lane] = 0  
+                waiting_times_shadow[junction][lane] = 0
         return None
+    lane_state = acquire_lane_state() if "LANE" in (mode, validation_mode) else None
+    traffic_light_state = None if signals_changed else acquire_traffic_light_state()
     for junction in up_stream_lanes.keys():
-        phase = traci.trafficlight.getPhase(junction)
-        # Add hidden vehicles based on internal edge location
-        if df_hidden_vehicles is not None and "edge" in df_hidden_vehicles.columns:
-            for lane in lanes[junction]:
-                edge = lane.split("_")[0]
-                hidden_on_edge = df_hidden_vehicles[df_hidden_vehicles["edge"] == edge]
-                if phase not in lane_to_phases[junction][lane]:
-                    for _, row in hidden_on_edge.iterrows():
-                        veh = row["veh_id"]  # or replace with actual column name
-                        if traci.vehicle.getSpeed(veh) < 0.1 and traci.vehicle.getWaitingTime(veh) > 0:
-                            waiting_times[junction][lane] += 1                 
+        if signals_changed:
+            phase = traci.trafficlight.getPhase(junction)
+        else:
+            phase = traffic_light_state[junction][tc.TL_CURRENT_PHASE]
         # Only count waiting time if signal is red (or yellow)
         for lane in lanes[junction]:
             if phase not in lane_to_phases[junction][lane]:
-                veh_ids = traci.lane.getLastStepVehicleIDs(lane)
-                for veh_id in veh_ids:
-                    if traci.vehicle.getSpeed(veh_id) < 0.1 and traci.vehicle.getWaitingTime(veh_id) > 0:
-                        waiting_times[junction][lane] += 1
-    if runde == cyclelength - 1:
-        # Add upstream vehicles to downstream lane
-        for junction in up_stream_lanes.keys():
-            for down, ups in up_stream_lanes[junction].items():
-                for up in ups:
-                    waiting_times[junction][down] += waiting_times[junction].get(up, 0)
+                waiting_times[junction][lane] += count_waiting_vehicles(lane, hidden_by_edge, vehicle_state, lane_state, mode)
+                if validation_mode is not None:
+                    waiting_times_shadow[junction][lane] += count_waiting_vehicles(lane, hidden_by_edge, vehicle_state, lane_state, validation_mode)
+    if ctx.runde == cyclelength - 1:
+        add_upstream_waiting_times(waiting_times, up_stream_lanes)
+        if validation_mode is not None:
+            add_upstream_waiting_times(waiting_times_shadow, up_stream_lanes)
+            ctx.waiting_times_validation.append((copy.deepcopy(waiting_times), copy.deepcopy(waiting_times_shadow)))
         return waiting_times
     else:
         return None
-
@@ -0,0 +1,87 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the gridlock watchdog. SUMO runs without teleports
+    (--time-to-teleport -1), so a bad parametrization can jam the network for
+    the rest of the simulation. The watchdog monitors network indicators
+    (halted fraction, insertion backlog, arrivals, vehicle count growth) and
+    detects gridlocks, so that the run can be aborted with penalty metrics.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import traci
+from traci import constants as tc
+
+
+
+
+# #############################################################################
+# ###### WATCHDOG PARAMETER ###################################################
+# #############################################################################
+WATCHDOG_INTERVAL = 60 # SECS, the indicators are evaluated every interval
+WATCHDOG_HALTING_SPEED = 0.1 # m/s, vehicles below this speed are halted (as in SUMO)
+WATCHDOG_HALTED_FRACTION = 0.9 # Jammed if at least this fraction of the vehicles is halted...
+WATCHDOG_MIN_ARRIVALS = 5 # ...and less than this number of vehicles arrived in the interval...
+WATCHDOG_PATIENCE = 10 # ...for this number of consecutive intervals, while the vehicle count or backlog grows
+WATCHDOG_MAX_BACKLOG = 2000 # Gridlock if this many vehicles wait for insertion
+    # Metrics of an aborted run (no throughput, worst delays and Gini coefficients,
+    # in the order returned by RunSimulation.Simulation)
+GRIDLOCK_DELAY = 9000.0
+GRIDLOCK_PENALTY = (0, 0, 0.0, 0.0, GRIDLOCK_DELAY, GRIDLOCK_DELAY, GRIDLOCK_DELAY, GRIDLOCK_DELAY,
+                    0.0, 1.0, 1.0, 1.0)
+
+
+
+
+# #############################################################################
+# ###### GRIDLOCK WATCHDOG ####################################################
+# #############################################################################
+class GridlockWatchdog:
+    def __init__(self):
+        self.arrivals = 0
+        self.last_count = 0
+        self.last_backlog = 0
+        self.jammed_intervals = 0
+        self.indicators = None
+
+    def check(self, step, vehicle_state):
+        """
+        Counts the arrivals (every step), evaluates the indicators (every
+        WATCHDOG_INTERVAL steps) and returns the reason of a gridlock, or None.
+        """
+        self.arrivals += traci.simulation.getArrivedNumber()
+        if step % WATCHDOG_INTERVAL != 0:
+            return None
+        count = len(vehicle_state)
+        halted = sum(1 for values in vehicle_state.values() if values[tc.VAR_SPEED] < WATCHDOG_HALTING_SPEED)
+        backlog = len(traci.simulation.getPendingVehicles())
+        self.indicators = {"step": step, "vehicles": count,
+                           "halted_fraction": halted / count if count > 0 else 0.0,
+                           "arrivals": self.arrivals,
+                           "vehicle_growth": count - self.last_count,
+                           "backlog": backlog}
+        growing = self.indicators["vehicle_growth"] > 0 or backlog > self.last_backlog
+        jammed = (self.indicators["halted_fraction"] >= WATCHDOG_HALTED_FRACTION and
+                  self.indicators["arrivals"] < WATCHDOG_MIN_ARRIVALS and growing)
+        self.jammed_intervals = self.jammed_intervals + 1 if jammed else 0
+        self.arrivals, self.last_count, self.last_backlog = 0, count, backlog
+        if backlog >= WATCHDOG_MAX_BACKLOG:
+            return f"insertion backlog of {backlog} vehicles"
+        if self.jammed_intervals >= WATCHDOG_PATIENCE:
+            return (f"{self.indicators['halted_fraction']:.0%} of {count} vehicles halted, "
+                    f"{self.indicators['arrivals']} arrivals in the last {WATCHDOG_INTERVAL} sec, "
+                    f"for {self.jammed_intervals * WATCHDOG_INTERVAL} sec")
+        return None
@@ -0,0 +1,233 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains a pool of long-lived simulation workers. Every worker
+    keeps its SUMO instance open and resets it with traci.load between jobs,
+    instead of launching SUMO and parsing the network for every simulation.
+    Workers are replaced after a number of jobs, and a worker that fails a
+    job exits after reporting the error, so that its SUMO instance and the
+    module state of the failed run are replaced with a new worker.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import time
+import queue
+import pickle
+import itertools
+import threading
+import traceback
+import multiprocessing
+import multiprocessing.util
+import numpy as np
+
+
+
+
+# #############################################################################
+# ###### WORKER PARAMETER #####################################################
+# #############################################################################
+WORKER_MAX_JOBS = 50 # Jobs per worker before it is replaced (releases SUMO and Python memory)
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def init_worker():
+    """
+    Initializes a worker process (keeps SUMO open between jobs, and closes it
+    when the worker is replaced).
+    """
+    import RunSimulation
+    RunSimulation.PERSISTENT_SUMO = True
+    multiprocessing.util.Finalize(None, RunSimulation.close_sumo, exitpriority=10)
+
+
+def run_job(job):
+    """
+    Runs one simulation job (controller, params, seed), params without the
+    seed, and returns its metrics and timings.
+    """
+    import RunSimulation
+    from SimulationContext import SimulationContext
+    controller, params, seed = job
+    ctx = SimulationContext(controller)
+    start = time.perf_counter()
+    result = RunSimulation.Simulation((seed,) + tuple(params), ctx)
+    timing = {"pid": os.getpid(), "startup_mode": ctx.startup_mode,
+              "startup_time": ctx.startup_time, "total_time": time.perf_counter() - start}
+    return result, timing
+
+
+def report(results, task_id, ok, value, exiting):
+    """
+    Reports the output of a task to the pool, exceptions that cannot be
+    pickled and restored are reported as RuntimeError.
+    """
+    if not ok:
+        try:
+            pickle.loads(pickle.dumps(value))
+        except Exception:
+            value = RuntimeError(f"{type(value).__name__}: {value}")
+    results.put((task_id, ok, value, exiting))
+
+
+def worker_loop(tasks, results, max_jobs, job_function):
+    """
+    Runs tasks (task_id, job) until max_jobs are done, a job fails, or the
+    pool is closed (task None). The last output tells the pool that the
+    worker exits, the pool then starts a new one.
+    """
+    init_worker()
+    for n in range(1, max_jobs + 1):
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, job = task
+        try:
+            output = job_function(job)
+        except Exception as e:
+            # Exit after a failed job, a new worker starts with a new SUMO instance
+            traceback.print_exc()
+            report(results, task_id, False, e, True)
+            return
+        report(results, task_id, True, output, n == max_jobs)
+
+
+
+
+# #############################################################################
+# ###### WORKER POOL ##########################################################
+# #############################################################################
+class SumoWorkerPool:
+    def __init__(self, processes, max_jobs=WORKER_MAX_JOBS, job_function=run_job):
+        self.max_jobs = max_jobs
+        self.job_function = job_function
+        self.tasks = multiprocessing.SimpleQueue()
+        self.results = multiprocessing.SimpleQueue()
+        self.task_ids = itertools.count()
+        self.pending = {} # task_id -> done
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock) # Notified when no job is pending
+        self.timings = []
+        self.workers = []
+        self.replaced = 0 # Workers replaced after max_jobs or a failed job
+        for k in range(processes):
+            self.start_worker()
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def start_worker(self):
+        """
+        Starts a worker process, and forgets the workers that exited.
+        """
+        for worker in [worker for worker in self.workers if not worker.is_alive()]:
+            worker.join()
+            self.workers.remove(worker)
+        worker = multiprocessing.Process(target=worker_loop, args=(self.tasks, self.results, self.max_jobs, self.job_function), daemon=True)
+        worker.start()
+        self.workers.append(worker)
+
+    def collect(self):
+        """
+        Collects the outputs of the workers (result thread), replaces exiting
+        workers and calls the done callbacks.
+        """
+        while True:
+            output = self.results.get()
+            if output is None:
+                return
+            task_id, ok, value, exiting = output
+            if exiting:
+                self.replaced += 1
+                self.start_worker()
+            with self.lock:
+                done = self.pending.pop(task_id)
+                if len(self.pending) == 0:
+                    self.idle.notify_all()
+            if ok:
+                result, timing = value
+                self.timings.append(timing)
+                done(result)
+            else:
+                done(value)
+
+    def map(self, jobs):
+        """
+        Runs the jobs [(controller, params, seed), ...] and returns their
+        metrics in order (raises the first error after all jobs finished).
+        """
+        outputs = queue.Queue()
+        for k, job in enumerate(jobs):
+            self.submit(job, lambda result, k=k: outputs.put((k, result)))
+        results = [None] * len(jobs)
+        for _ in jobs:
+            k, result = outputs.get()
+            results[k] = result
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def submit(self, job, done):
+        """
+        Schedules a job (controller, params, seed) without waiting for it,
+        done(metrics) is called when it finishes (done(exception) if it
+        fails), from the result thread of the pool.
+        """
+        task_id = next(self.task_ids)
+        with self.lock:
+            self.pending[task_id] = done
+        self.tasks.put((task_id, job))
+
+    def startup_summary(self):
+        """
+        Summarizes the SUMO startup times of all jobs so far, and the wall time
+        saved by resetting SUMO with traci.load instead of launching it.
+        """
+        summary = {"jobs": len(self.timings)}
+        for mode in ["start", "load"]:
+            times = [t["startup_time"] for t in self.timings if t["startup_mode"] == mode]
+            summary[mode+"_count"] = len(times)
+            summary[mode+"_mean"] = np.mean(times) if len(times) > 0 else np.nan
+        summary["total_time_mean"] = np.mean([t["total_time"] for t in self.timings]) if len(self.timings) > 0 else np.nan
+        summary["saved_time"] = summary["load_count"] * (summary["start_mean"] - summary["load_mean"]) if summary["load_count"] > 0 else 0
+        return summary
+
+    def print_startup_summary(self):
+        summary = self.startup_summary()
+        print("\n=== SUMO Startup ===")
+        print(f"Jobs:                      {summary['jobs']}")
+        print(f"Launched (traci.start):    {summary['start_count']} x {summary['start_mean']:.2f} sec")
+        print(f"Reset (traci.load):        {summary['load_count']} x {summary['load_mean']:.2f} sec")
+        print(f"Mean Time per Simulation:  {summary['total_time_mean']:.2f} sec")
+        print(f"Saved Wall Time (total):   {summary['saved_time']:.2f} sec", flush=True)
+
+    def close(self):
+        """
+        Waits for the pending jobs and stops the workers.
+        """
+        with self.idle:
+            self.idle.wait_for(lambda: len(self.pending) == 0)
+        for worker in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.results.put(None)
+        self.collector.join()
@@ -0,0 +1,110 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script benchmarks the simulation speed (simulation steps per second)
+    of the traci (socket) and libsumo (in-process) backends on the Esslingen
+    model. Every backend runs in its own process, as the backend is selected
+    when traci is imported.
+
+    Usage: python Benchmark_Backend.py --sumo-path <sumo binary> [--controller FIXED_CYCLE] [--seed 41]
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+
+
+
+# #############################################################################
+# ###### PARAMETER ############################################################
+# #############################################################################
+CODE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BACKENDS = ["traci", "libsumo"]
+    # Parameters For SCOSCA (see README.md)
+PARAMS = (46.71, 6.62, 0.79, 0.24, 0.14, -1, -1, -1)
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def run_child(controller, seed):
+    """
+    Runs one simulation with the backend selected by the environment.
+    """
+    sys.path.insert(0, CODE_DIR)
+    os.chdir(CODE_DIR)
+    import RunSimulation
+    RunSimulation.CONTROL_MODE = controller
+    RunSimulation.RESULT_CACHE = False
+    steps = RunSimulation.SIMULATION_DURATION + 1
+    start = time.perf_counter()
+    RunSimulation.Simulation((seed,) + PARAMS)
+    duration = time.perf_counter() - start
+    print(f"BENCHMARK BACKEND: {RunSimulation.SUMO_BACKEND}", flush=True)
+    print(f"BENCHMARK STEPS: {steps}", flush=True)
+    print(f"BENCHMARK SECONDS: {duration}", flush=True)
+
+
+def run_backend(backend, sumo_binary, controller, seed):
+    """
+    Runs the benchmark for one backend in a separate process.
+    """
+    env = dict(os.environ, SUMO_BACKEND=backend, SUMO_BINARY=sumo_binary)
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child",
+                              "--controller", controller, "--seed", str(seed)],
+                             cwd=CODE_DIR, env=env, capture_output=True, text=True)
+    result = {}
+    for line in process.stdout.split("\n"):
+        if line.startswith("BENCHMARK "):
+            key, value = line[len("BENCHMARK "):].split(":")
+            result[key.strip()] = value.strip()
+    if process.returncode != 0 or "SECONDS" not in result:
+        print(f">> {backend} failed:\n{process.stderr}", flush=True)
+        return None
+    return result
+
+
+
+
+# #############################################################################
+# ###### MAIN CODE ############################################################
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sumo-path", default=os.environ.get("SUMO_BINARY", "sumo"))
+    parser.add_argument("--controller", default="FIXED_CYCLE")
+    parser.add_argument("--seed", type=int, default=41)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.controller, args.seed)
+    else:
+        print("Backend Benchmark ("+args.controller+", seed "+str(args.seed)+")")
+        print(">>>>>>>>>>>>>>>>>>>>>>>>")
+        for backend in BACKENDS:
+            result = run_backend(backend, args.sumo_path, args.controller, args.seed)
+            if result is None:
+                continue
+            steps_per_second = float(result["STEPS"]) / float(result["SECONDS"])
+            print(f"{backend:8s} (running {result['BACKEND']}): {steps_per_second:8.1f} steps/sec "
+                  f"({float(result['SECONDS']):.1f} sec)", flush=True)
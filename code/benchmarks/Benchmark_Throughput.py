@@ -0,0 +1,283 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+
+"""
+    This script benchmarks the simulation throughput of all five controller
+    modes on the Esslingen model with pinned seeds. Every run records the wall
+    time, the simulated seconds per second, the peak memory (RSS) and the
+    TraCI calls, appends them to a JSON history, and compares them with a
+    stored baseline (with tolerances). The headline metrics (AVG DELAY, GINI
+    TOTAL, ...) are compared with the baseline and, for the full horizon, with
+    the reference logs (logs/<MODE>/seed_<seed>/Output.txt), so that
+    performance work cannot silently alter the results. Every run is executed
+    in its own process.
+
+    Usage: python Benchmark_Throughput.py --sumo-path <sumo binary> [--modes SCOSCA ...] [--seeds 41 ...]
+                                          [--horizon <seconds>] [--save-baseline]
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import tempfile
+import subprocess
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+
+
+
+# #############################################################################
+# ###### PARAMETER ############################################################
+# #############################################################################
+CODE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LOG_DIR = os.path.abspath(os.path.join(CODE_DIR, "..", "logs"))
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Throughput_History.json")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Throughput_Baseline.json")
+MODES = ["FIXED_CYCLE", "MAX_PRESSURE", "SCOSCA", "SCOSCAFAIRV1", "SCOSCAFAIRV2"]
+SEEDS = [41]
+WARMUP_DURATION = 1800 # SECS, RunSimulation.WARMUP_DURATION (the horizon must be longer)
+    # Parameters per controller (see README.md, FIXED_CYCLE and MAX_PRESSURE do not use them)
+PARAMS = {"FIXED_CYCLE":  (46.71, 6.62, 0.79, 0.24, 0.14, -1, -1, -1),
+          "MAX_PRESSURE": (46.71, 6.62, 0.79, 0.24, 0.14, -1, -1, -1),
+          "SCOSCA":       (46.71, 6.62, 0.79, 0.24, 0.14, -1, -1, -1),
+          "SCOSCAFAIRV1": (28.66, 14.99, 2.41, 0.32, 0.47, 0.62, -1, -1),
+          "SCOSCAFAIRV2": (39.28, 13.96, 0.34, 0.30, 0.55, -1, 54.97, 3.68)}
+    # Headline metrics (in the order returned by RunSimulation.Simulation, as in Output.txt)
+METRIC_KEYS = ["THROUGHPUT", "FLOW", "AVG SPEED", "DENSITY", "AVG DELAY", "AVG. DELAY SIDEROAD",
+               "AVG. DELAY MAINROAD", "MAX DELAY", "TOTAL TRAVEL TIME", "GINI TOTAL", "GINI SIDEROAD", "GINI MAINROAD"]
+    # Tolerances (relative)
+SPEED_TOLERANCE = 0.10 # Simulated seconds per second may be 10% below the baseline
+RSS_TOLERANCE = 0.20 # Peak RSS may be 20% above the baseline
+TRACI_CALLS_TOLERANCE = 0.0 # TraCI calls may not increase
+METRIC_TOLERANCE = 1e-9 # Headline metrics must be unchanged
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def get_peak_rss_mb(who):
+    """
+    Returns the peak resident set size of this process (or its terminated
+    child processes) in MB, None if unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kB, macOS reports bytes
+    return peak / (1024*1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(controller, seed, horizon, result_file):
+    """
+    Runs one simulation and writes its record to the result file.
+    """
+    sys.path.insert(0, CODE_DIR)
+    os.chdir(CODE_DIR)
+    import RunSimulation
+    RunSimulation.CONTROL_MODE = controller
+    RunSimulation.RESULT_CACHE = False
+    RunSimulation.DEBUG_DIAGNOSTICS = False
+    if horizon is not None:
+        RunSimulation.SIMULATION_DURATION = horizon
+    profile_file = result_file + ".profile.json"
+    RunSimulation.PROFILING = True
+    RunSimulation.PROFILE_FILE = profile_file
+    start = time.perf_counter()
+    metrics = RunSimulation.Simulation((seed,) + PARAMS[controller])
+    wall_time = time.perf_counter() - start
+    with open(profile_file, "r") as f:
+        profile = json.load(f)
+    os.remove(profile_file)
+    record = {"controller": controller, "seed": seed, "horizon": RunSimulation.SIMULATION_DURATION,
+              "backend": RunSimulation.SUMO_BACKEND, "wall_time": wall_time,
+              "sim_seconds_per_second": RunSimulation.SIMULATION_DURATION / wall_time,
+              "peak_rss_mb": get_peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+              "sumo_peak_rss_mb": get_peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+              "traci_calls": profile["traci_calls"]["total"],
+              "traci_calls_by_domain": profile["traci_calls"]["by_domain"],
+              "stage_times": {stage: times["total"] for stage, times in profile["stages"].items()},
+              "metrics": dict(zip(METRIC_KEYS, [float(m) for m in metrics]))}
+    with open(result_file, "w") as f:
+        json.dump(record, f, indent=2)
+
+
+def run_benchmark(sumo_binary, controller, seed, horizon):
+    """
+    Runs the benchmark for one controller and seed in a separate process.
+    """
+    env = dict(os.environ, SUMO_BINARY=sumo_binary)
+    result_file = os.path.join(tempfile.mkdtemp(), "Result.json")
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--modes", controller,
+               "--seeds", str(seed), "--result-file", result_file]
+    if horizon is not None:
+        command += ["--horizon", str(horizon)]
+    process = subprocess.run(command, cwd=CODE_DIR, env=env, capture_output=True, text=True)
+    if process.returncode != 0 or not os.path.exists(result_file):
+        print(f">> {controller} (seed {seed}) failed:\n{process.stderr}", flush=True)
+        return None
+    with open(result_file, "r") as f:
+        record = json.load(f)
+    os.remove(result_file)
+    return record
+
+
+def load_reference_metrics(controller, seed):
+    """
+    Loads the headline metrics of the reference logs (Output.txt, other lines
+    are ignored), None if there are no reference logs for this controller and
+    seed.
+    """
+    file = os.path.join(LOG_DIR, controller, "seed_"+str(seed), "Output.txt")
+    if not os.path.exists(file):
+        return None
+    data = {}
+    with open(file, "r") as f:
+        for line in f.read().split("\n"):
+            key = line.split(":")[0].strip()
+            if ":" in line and key in METRIC_KEYS:
+                data[key] = float(line.split(":")[1].strip())
+    return data
+
+
+def compare_metrics(metrics, reference):
+    """
+    Returns the headline metrics that differ from the reference.
+    """
+    differences = []
+    for key in METRIC_KEYS:
+        if key not in reference:
+            continue
+        if abs(metrics[key] - reference[key]) > METRIC_TOLERANCE * max(1.0, abs(reference[key])):
+            differences.append(f"{key}: {metrics[key]} (reference {reference[key]})")
+    return differences
+
+
+def compare_with_baseline(record, baseline):
+    """
+    Returns the regressions of a record against its baseline record.
+    """
+    regressions = []
+    if record["sim_seconds_per_second"] < baseline["sim_seconds_per_second"] * (1 - SPEED_TOLERANCE):
+        regressions.append(f"sim-sec/sec {record['sim_seconds_per_second']:.1f} (baseline {baseline['sim_seconds_per_second']:.1f})")
+    for key in ["peak_rss_mb", "sumo_peak_rss_mb"]:
+        if record[key] is not None and baseline.get(key) is not None and record[key] > baseline[key] * (1 + RSS_TOLERANCE):
+            regressions.append(f"{key} {record[key]:.0f} MB (baseline {baseline[key]:.0f} MB)")
+    if record["traci_calls"] > baseline["traci_calls"] * (1 + TRACI_CALLS_TOLERANCE):
+        regressions.append(f"TraCI calls {record['traci_calls']} (baseline {baseline['traci_calls']})")
+    regressions += compare_metrics(record["metrics"], baseline["metrics"])
+    return regressions
+
+
+def get_record_key(record):
+    return f"{record['controller']}/seed_{record['seed']}/horizon_{record['horizon']}/{record['backend']}"
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CODE_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def load_json(file, default):
+    if not os.path.exists(file):
+        return default
+    with open(file, "r") as f:
+        return json.load(f)
+
+
+def save_json(file, data):
+    with open(file, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+
+
+# #############################################################################
+# ###### MAIN CODE ############################################################
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sumo-path", default=os.environ.get("SUMO_BINARY", "sumo"))
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--seeds", nargs="+", type=int, default=SEEDS)
+    parser.add_argument("--horizon", type=int, default=None, help="simulated seconds (default: full simulation)")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--result-file", default=None)
+    args = parser.parse_args()
+    if args.horizon is not None and args.horizon <= WARMUP_DURATION:
+        parser.error(f"--horizon must be longer than the warm-up ({WARMUP_DURATION} sec)")
+    if args.child:
+        run_child(args.modes[0], args.seeds[0], args.horizon, args.result_file)
+        sys.exit(0)
+    
+    print("Throughput Benchmark (seeds "+", ".join(str(s) for s in args.seeds)+
+          ", horizon "+(str(args.horizon)+" sec" if args.horizon else "full")+")")
+    print(">>>>>>>>>>>>>>>>>>>>>>>>")
+    baseline = load_json(args.baseline, {})
+    records = []
+    failed = False
+    for controller in args.modes:
+        for seed in args.seeds:
+            record = run_benchmark(args.sumo_path, controller, seed, args.horizon)
+            if record is None:
+                failed = True
+                continue
+            records.append(record)
+            print(f"{controller:13s} seed {seed}: {record['sim_seconds_per_second']:8.1f} sim-sec/sec "
+                  f"({record['wall_time']:.1f} sec, {record['traci_calls']} TraCI calls, "
+                  f"peak RSS {record['peak_rss_mb'] or float('nan'):.0f} MB)", flush=True)
+            # Compare with the reference logs (full horizon only)
+            reference = load_reference_metrics(controller, seed) if args.horizon is None else None
+            if reference is not None:
+                for difference in compare_metrics(record["metrics"], reference):
+                    print(f"   >> Output.txt differs: {difference}", flush=True)
+                    failed = True
+            # Compare with the baseline
+            key = get_record_key(record)
+            if key not in baseline:
+                print("   >> no baseline", flush=True)
+                continue
+            for regression in compare_with_baseline(record, baseline[key]):
+                print(f"   >> regression: {regression}", flush=True)
+                failed = True
+    
+    # Append to the history
+    history = load_json(args.history, [])
+    history.append({"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "revision": get_git_revision(), "records": records})
+    save_json(args.history, history)
+    if args.save_baseline:
+        baseline.update({get_record_key(record): record for record in records})
+        save_json(args.baseline, baseline)
+        print("Baseline saved: "+args.baseline)
+    print(">>>>>>>>>>>>>>>>>>>>>>>>")
+    print("FAILED" if failed else "PASSED", flush=True)
+    sys.exit(1 if failed else 0)
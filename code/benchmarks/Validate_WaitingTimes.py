@@ -0,0 +1,115 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script validates the lane-aggregate waiting times of FairSCOSCA_1
+    (halting number per lane) against the vehicle-level waiting times. The
+    simulation is controlled with one mode, the other mode is calculated
+    alongside, and both waiting_times dicts are compared cycle by cycle.
+    The recorded waiting times are written to a CSV file (one row per cycle,
+    junction and lane).
+
+    Usage: python Validate_WaitingTimes.py --sumo-path <sumo binary> [--seed 41] [--mode VEHICLE] [--output <csv>]
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import sys
+import argparse
+import pandas as pd
+
+
+
+
+# #############################################################################
+# ###### PARAMETER ############################################################
+# #############################################################################
+CODE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODES = ["VEHICLE", "LANE"]
+    # Parameters For FairSCOSCA_1 (see README.md)
+PARAMS = (28.66, 14.99, 2.41, 0.32, 0.47, 0.62, -1, -1)
+
+
+
+
+# #############################################################################
+# ###### METHODS ##############################################################
+# #############################################################################
+
+def record_waiting_times(seed, mode):
+    """
+    Runs one FairSCOSCA_1 simulation controlled with the given mode and
+    returns the waiting times of both modes per cycle.
+    """
+    sys.path.insert(0, CODE_DIR)
+    os.chdir(CODE_DIR)
+    import RunSimulation
+    from SimulationContext import SimulationContext
+    validation_mode = [m for m in MODES if m != mode][0]
+    RunSimulation.CONTROL_MODE = "SCOSCAFAIRV1"
+    RunSimulation.WAITING_TIME_MODE = mode
+    RunSimulation.WAITING_TIME_VALIDATION = validation_mode
+    ctx = SimulationContext()
+    RunSimulation.Simulation((seed,) + PARAMS, ctx)
+    records = []
+    for cycle, (waiting_times, waiting_times_shadow) in enumerate(ctx.waiting_times_validation):
+        for junction in waiting_times:
+            for lane in waiting_times[junction]:
+                records.append({"cycle": cycle, "junction": junction, "lane": lane,
+                                mode: waiting_times[junction][lane],
+                                validation_mode: waiting_times_shadow[junction][lane]})
+    return pd.DataFrame(records, columns=["cycle", "junction", "lane"] + MODES)
+
+
+def compare_waiting_times(df):
+    """
+    Summarizes the differences between the modes per cycle.
+    """
+    df["difference"] = df["LANE"] - df["VEHICLE"]
+    df["abs_difference"] = df["difference"].abs()
+    per_cycle = df.groupby("cycle").agg(VEHICLE=("VEHICLE", "sum"), LANE=("LANE", "sum"),
+                                        max_abs_difference=("abs_difference", "max"),
+                                        lanes_different=("abs_difference", lambda x: int((x > 0).sum())))
+    return per_cycle
+
+
+
+
+# #############################################################################
+# ###### MAIN CODE ############################################################
+# #############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sumo-path", default=os.environ.get("SUMO_BINARY", "sumo"))
+    parser.add_argument("--seed", type=int, default=41)
+    parser.add_argument("--mode", default="VEHICLE", choices=MODES)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    os.environ["SUMO_BINARY"] = args.sumo_path
+    output = os.path.abspath(args.output) if args.output else None
+    
+    df = record_waiting_times(args.seed, args.mode)
+    if output is not None:
+        df.to_csv(output, index=False)
+    per_cycle = compare_waiting_times(df)
+    print("Waiting Time Validation (seed "+str(args.seed)+", controlled with "+args.mode+")")
+    print(">>>>>>>>>>>>>>>>>>>>>>>>")
+    print(per_cycle.to_string())
+    print(">>>>>>>>>>>>>>>>>>>>>>>>")
+    print("CYCLES", len(per_cycle))
+    print("CYCLES IDENTICAL", int((per_cycle["max_abs_difference"] == 0).sum()))
+    print("TOTAL VEHICLE", int(df["VEHICLE"].sum()))
+    print("TOTAL LANE", int(df["LANE"].sum()))
+    print("MAX ABS DIFFERENCE", int(df["abs_difference"].max()) if len(df) else 0)
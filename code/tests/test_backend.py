@@ -0,0 +1,49 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the SUMO backend selection (Backend.py).
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import pytest
+from Backend import select_backend, check_backend
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def test_select_backend_falls_back_to_traci_for_gui(monkeypatch):
+    monkeypatch.delenv("LIBSUMO_AS_TRACI", raising=False)
+    assert select_backend("libsumo", "/usr/bin/sumo") == "libsumo"
+    assert select_backend("libsumo", "C:/sumo/bin/sumo-gui.exe") == "traci"
+    assert select_backend("traci", "/usr/bin/sumo") == "traci"
+    monkeypatch.delenv("LIBSUMO_AS_TRACI", raising=False)
+
+
+def test_check_backend_against_effective_binary():
+    check_backend("libsumo", "/usr/bin/sumo", True)
+    check_backend("traci", "/usr/bin/sumo-gui", False)
+    # GUI binary set after the backend was selected
+    with pytest.raises(RuntimeError, match="no GUI"):
+        check_backend("libsumo", "C:/sumo/bin/sumo-gui.exe", True)
+    # traci imported before Backend.py
+    with pytest.raises(RuntimeError, match="imported before"):
+        check_backend("libsumo", "/usr/bin/sumo", False)
+    with pytest.raises(RuntimeError, match="imported before"):
+        check_backend("traci", "/usr/bin/sumo", True)
@@ -0,0 +1,54 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the reference log parsing of the
+    throughput benchmark (benchmarks/Benchmark_Throughput.py).
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import Benchmark_Throughput
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def test_load_reference_metrics_reads_only_metric_lines(tmp_path, monkeypatch):
+    """
+    Diagnostics and notices in Output.txt (lines with colons that are not
+    metrics) are ignored.
+    """
+    monkeypatch.setattr(Benchmark_Throughput, "LOG_DIR", str(tmp_path))
+    os.makedirs(tmp_path / "SCOSCA" / "seed_41")
+    (tmp_path / "SCOSCA" / "seed_41" / "Output.txt").write_text(
+        "SUMO STARTUP (start): 0.52 sec\nTHROUGHPUT: 12605\nAVG DELAY: 99.79936808846762\n"
+        "SIGNAL PLAN UPLOADS: 12 (unchanged: 40), TRACI CALLS PER CYCLE: 3.0\nGINI MAINROAD: 0.5380963455112178")
+    assert Benchmark_Throughput.load_reference_metrics("SCOSCA", 41) == {
+        "THROUGHPUT": 12605.0, "AVG DELAY": 99.79936808846762, "GINI MAINROAD": 0.5380963455112178}
+    assert Benchmark_Throughput.load_reference_metrics("SCOSCA", 42) is None
+
+
+def test_load_reference_metrics_of_committed_logs():
+    """
+    The committed reference logs contain all headline metrics.
+    """
+    reference = Benchmark_Throughput.load_reference_metrics("SCOSCA", 41)
+    assert list(reference.keys()) == Benchmark_Throughput.METRIC_KEYS
@@ -0,0 +1,139 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the SCATS degree of saturation
+    (Utils.calculate_degree_of_saturation_SCATS) against the original per-lane
+    loop. Detector readings and phases are random, and are served to both
+    implementations without SUMO.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import numpy as np
+import pytest
+import traci
+from traci import constants as tc
+import Utils
+from Utils import calculate_degree_of_saturation_SCATS, lane_to_phases
+from ControllerMaxPressure import create_signal_controllers
+from SimulationContext import SimulationContext
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+class BaselineDegreeOfSaturation:
+    """
+    Original calculate_degree_of_saturation_SCATS (module globals kept as
+    attributes, TraCI queries replaced by the readings of the step).
+    """
+    def __init__(self, lane_to_detector):
+        self.lane_to_detector = lane_to_detector
+        self.runde = 0
+
+    def calculate(self, greentimes, cyclelength, step, JUNCTION_IDS, lanes, phases, detectors):
+        lane_to_detector = self.lane_to_detector
+        if step == 0:
+            self.runde = 0
+        if self.runde == 0:
+            self.T_NO, self.greentime, self.vehicles_count, self.DS_SCATS, self.detected_vehicles = {}, {}, {}, {}, {}
+            for junction in JUNCTION_IDS:
+                self.greentime[junction], self.T_NO[junction], self.DS_SCATS[junction] = {}, {}, {}
+                self.vehicles_count[junction], self.detected_vehicles[junction] = {}, {}
+                for lane in lanes[junction]:
+                    if lane in lane_to_detector:
+                        self.vehicles_count[junction][lane] = 0
+                        self.detected_vehicles[junction][lane] = set()
+                        self.greentime[junction][lane] = sum([greentimes[junction][p//2] for p in lane_to_phases[junction][lane]])
+                        self.T_NO[junction][lane] = self.greentime[junction][lane]
+        for junction in JUNCTION_IDS:
+            phase = phases[junction]
+            for lane in lanes[junction]:
+                if lane in lane_to_detector:
+                    detector = lane_to_detector[lane]
+                    if phase in lane_to_phases[junction][lane]:
+                        current_vehicles = set(detectors[detector][tc.LAST_STEP_VEHICLE_ID_LIST])
+                        new_vehicles = current_vehicles - self.detected_vehicles[junction][lane]
+                        occupancy = detectors[detector][tc.LAST_STEP_OCCUPANCY] / 100
+                        if occupancy > 0:
+                            self.T_NO[junction][lane] -= occupancy
+                            self.vehicles_count[junction][lane] += len(new_vehicles)
+                            self.detected_vehicles[junction][lane].update(new_vehicles)
+        if self.runde == cyclelength - 1:
+            for junction in JUNCTION_IDS:
+                for lane in lanes[junction]:
+                    if lane in lane_to_detector:
+                        self.DS_SCATS[junction][lane] = max(
+                            (self.greentime[junction][lane] - (self.T_NO[junction][lane] - 1.87 * self.vehicles_count[junction][lane]))
+                            / self.greentime[junction][lane], 0)
+            self.runde = 0
+            return self.DS_SCATS
+        self.runde += 1
+        return None
+
+
+def get_lanes():
+    # As in RunSimulation.simulate (lanes of the Max Pressure links, with duplicates)
+    return {c.intersection_name: [lane for group in c.links.values() for lane in group] for c in create_signal_controllers()}
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_degree_of_saturation_matches_original_loop(seed, monkeypatch):
+    lanes = get_lanes()
+    JUNCTION_IDS = list(lanes.keys())
+    assert lanes["intersection2"].count("-38361908#1_1") == 2
+    # Detectors on all lanes with phases, except one lane per junction
+    detector_lanes = sorted(set(lane for junction in JUNCTION_IDS for lane in lanes[junction][1:] if lane in lane_to_phases[junction]))
+    lane_to_detector = {lane: "det_"+lane for lane in detector_lanes}
+    detector_of_id = {detector: lane for lane, detector in lane_to_detector.items()}
+    monkeypatch.setattr(traci.inductionloop, "getIDList", lambda: list(detector_of_id.keys()))
+    monkeypatch.setattr(traci.inductionloop, "getLaneID", lambda detector: detector_of_id[detector])
+    monkeypatch.setattr(Utils, "subscribe_detectors", lambda detector_ids: None)
+    monkeypatch.setattr(Utils, "subscribe_traffic_lights", lambda tls_ids: None)
+    readings = {}
+    monkeypatch.setattr(Utils, "acquire_detector_state", lambda: readings["detectors"])
+    monkeypatch.setattr(Utils, "acquire_traffic_light_state",
+                        lambda: {junction: {tc.TL_CURRENT_PHASE: phase} for junction, phase in readings["phases"].items()})
+    monkeypatch.setattr(traci.trafficlight, "getPhase", lambda junction: readings["phases"][junction])
+    rng = np.random.default_rng(seed)
+    ctx = SimulationContext()
+    baseline = BaselineDegreeOfSaturation(lane_to_detector)
+    cyclelength = 30
+    greentimes = {"intersection1": [27, 27, 27], "intersection2": [38, 6, 37], "intersection3": [38, 6, 37],
+                  "intersection4": [42, 42], "intersection5": [38, 6, 37]}
+    n_results = 0
+    for step in range(0, 4*cyclelength):
+        if step % cyclelength == 0:
+            greentimes = {junction: [max(g + int(rng.integers(-3, 4)), 1) for g in greens] for junction, greens in greentimes.items()}
+        readings["phases"] = {junction: int(rng.integers(0, 2*len(greentimes[junction]))) for junction in JUNCTION_IDS}
+        readings["detectors"] = {
+            detector: {tc.LAST_STEP_OCCUPANCY: float(rng.uniform(0, 100)) if rng.random() < 0.6 else 0.0,
+                       tc.LAST_STEP_VEHICLE_ID_LIST: tuple(f"VEH_{v}" for v in rng.integers(0, 40, size=rng.integers(0, 3)))}
+            for detector in detector_of_id}
+        expected = baseline.calculate(greentimes, cyclelength, step, JUNCTION_IDS, lanes, readings["phases"], readings["detectors"])
+        result = calculate_degree_of_saturation_SCATS(ctx, greentimes, cyclelength, step, JUNCTION_IDS, lanes,
+                                                      signals_changed=(step % 7 == 0))
+        if expected is None:
+            assert result is None
+            continue
+        n_results += 1
+        assert result.keys() == expected.keys()
+        for junction in JUNCTION_IDS:
+            assert list(result[junction].keys()) == list(expected[junction].keys())
+            assert result[junction] == pytest.approx(expected[junction], rel=1e-12)
+    assert n_results == 4
@@ -0,0 +1,140 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the demand model (Demand.py) against
+    the original spawning, which scanned the spawn tables for the current
+    time (Adjusted_Datetime) in every simulation step.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from Demand import compile_spawn_schedule, compile_demand, determine_whether_truck_banned_route, sumo_vehicle_types
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+START_TIME = datetime.strptime("2024-03-04 15:15:00", "%Y-%m-%d %H:%M:%S") # as in RunSimulation.py
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "model")
+
+
+def write_vehicle_spawns(folder):
+    # Unsorted times, several rows per second, fractional counts, and rows outside the simulated period
+    times = ["15:15:00", "15:14:56", "15:15:07", "15:15:07", "15:16:40", "15:15:01", "15:25:00", "15:25:01", "16:00:00"]
+    routes = ["route_E4_A1", "route_E11_A7", "route_E4_A12", "route_E13_A16", "route_E11_A7", "route_E20_A3",
+              "route_E4_A1", "route_E13_A16", "route_E4_A12"]
+    counts = [1.0, 2.0, 1.3, 2.0, 0.4, 3.0, 2.0, 1.0, 1.0]
+    df = pd.DataFrame({"Datetime": ["2024-03-04 "+t for t in times], "n_spawn": counts, "route": routes,
+                       "spawn_delay": 0, "Adjusted_Datetime": ["2024-03-04 "+t for t in times]})
+    spawn_file = os.path.join(folder, "Spawn_Vehicles.csv")
+    df.to_csv(spawn_file)
+    return spawn_file
+
+
+def get_baseline_rows(spawn_file, start_time, duration):
+    # Original spawning: (step, route, vehicles, stops) of the rows spawned in every step
+    df_spawn = pd.read_csv(spawn_file)
+    rows = []
+    for step in range(0, duration+1):
+        current_time = (start_time + timedelta(seconds=step)).strftime("%Y-%m-%d %H:%M:%S")
+        for idx, row in df_spawn[df_spawn["Adjusted_Datetime"]==current_time].iterrows():
+            stops = str(row["Stops"]) if "Stops" in df_spawn.columns else None
+            rows.append((step, str(row["route"]), int(np.ceil(row["n_spawn"])), stops))
+    return rows
+
+
+def get_schedule_rows(schedule, duration):
+    rows = []
+    for step in range(0, duration+1):
+        for row in schedule.rows(step):
+            stops = schedule.stops[row] if schedule.stops is not None else None
+            rows.append((step, schedule.routes[row], int(schedule.counts[row]), stops))
+    return rows
+
+
+def test_spawn_schedule_matches_original_spawning(tmp_path):
+    spawn_file = write_vehicle_spawns(tmp_path)
+    schedule = compile_spawn_schedule(spawn_file, START_TIME, 600)
+    rows = get_schedule_rows(schedule, 600)
+    assert rows == get_baseline_rows(spawn_file, START_TIME, 600)
+    assert [step for step, route, n, stops in rows] == [0, 1, 7, 7, 100, 600]
+    # Steps outside the schedule spawn nothing
+    assert list(schedule.rows(-1)) == [] and list(schedule.rows(601)) == []
+
+
+def test_bus_spawn_schedule_matches_original_spawning():
+    spawn_file = os.path.join(MODEL_DIR, "Spawn_Bus.csv")
+    duration = 9000 # RunSimulation.SIMULATION_DURATION
+    rows = get_schedule_rows(compile_spawn_schedule(spawn_file, START_TIME, duration), duration)
+    assert len(rows) > 0
+    assert rows == get_baseline_rows(spawn_file, START_TIME, duration)
+
+
+def get_baseline_vehicle_class(no_truck=False):
+    # Original get_random_vehicle_class (global numpy generator)
+    probs = [0.81, 0.082, 0.046, 0.062]
+    vals = ["car", "moc", "lwt", "hwt"]
+    random_vehicle_class = np.random.choice(vals, size=1, p=probs)[0]
+    while no_truck and random_vehicle_class=="hwt":
+        random_vehicle_class = np.random.choice(vals, size=1, p=probs)[0]
+    return random_vehicle_class
+
+
+def get_baseline_vehicles(seed, veh_spawn_file, bus_spawn_file, start_time, duration):
+    # Original runtime spawning: (id, type, route, step, stops) of every vehicle added with TraCI
+    np.random.seed(seed)
+    veh_rows = get_baseline_rows(veh_spawn_file, start_time, duration)
+    bus_rows = get_baseline_rows(bus_spawn_file, start_time, duration)
+    vehicles = []
+    veh_ctr = 0
+    for step in range(0, duration+1):
+        for row_step, route, n_spawn, stops in veh_rows:
+            if row_step != step:
+                continue
+            for x in range(0, n_spawn):
+                veh_ctr += 1
+                vehicle_class = get_baseline_vehicle_class(determine_whether_truck_banned_route(route))
+                vehicles.append(("VEH_"+str(veh_ctr), sumo_vehicle_types[vehicle_class], route, step, []))
+        for row_step, route, n_spawn, stops in bus_rows:
+            if row_step == step:
+                veh_ctr += 1
+                vehicles.append(("BUS_"+str(veh_ctr)+"-"+route, "sumo_bus", route, step, stops.split("-")))
+    return vehicles
+
+
+def test_compiled_demand_matches_runtime_spawning(tmp_path):
+    veh_spawn_file = write_vehicle_spawns(tmp_path)
+    bus_spawn_file = os.path.join(MODEL_DIR, "Spawn_Bus.csv")
+    route_file = compile_demand(41, veh_spawn_file, bus_spawn_file, START_TIME, 900, 20, str(tmp_path / "demand"))
+    vehicles = []
+    for vehicle in ET.parse(route_file).getroot().iter("vehicle"):
+        # Departure of vehicles added with traci.vehicle.add
+        assert (vehicle.get("departLane"), vehicle.get("departPos"), vehicle.get("departSpeed")) == ("first", "base", "0")
+        stops = [stop.get("busStop") for stop in vehicle.iter("stop")]
+        assert all(stop.get("duration") == "20" for stop in vehicle.iter("stop"))
+        vehicles.append((vehicle.get("id"), vehicle.get("type"), vehicle.get("route"), int(float(vehicle.get("depart"))), stops))
+    expected = get_baseline_vehicles(41, veh_spawn_file, bus_spawn_file, START_TIME, 900)
+    assert sum(1 for vehicle in expected if vehicle[1] == "sumo_bus") > 0
+    assert vehicles == expected
+    # Other seeds draw other vehicle classes
+    other_file = compile_demand(42, veh_spawn_file, bus_spawn_file, START_TIME, 900, 20, str(tmp_path / "demand"))
+    assert other_file != route_file
@@ -0,0 +1,94 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the Gini coefficients (Utils.py)
+    against the pairwise formula of the original get_gini.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import warnings
+import numpy as np
+import pytest
+from Utils import gini_coefficient, StreamingGini
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def pairwise_gini(values):
+    # Original get_gini: sum|x_i - x_j| / (2 n^2 mean)
+    i = np.array(values, dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        n = len(i)
+        mean_value = np.mean(i)
+        total_absolute_differences = np.sum(np.abs(i[:, None] - i))
+        return total_absolute_differences / (2 * n**2 * mean_value)
+
+
+def streaming_gini(values):
+    estimator = StreamingGini()
+    for value in values:
+        estimator.add(value)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return estimator.gini()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_gini_coefficient_matches_pairwise_formula(seed):
+    rng = np.random.default_rng(seed)
+    delays = rng.exponential(60.0, size=500)
+    assert gini_coefficient(delays) == pytest.approx(pairwise_gini(delays), rel=1e-12)
+    # Order of the values does not matter
+    assert gini_coefficient(delays[::-1]) == pytest.approx(pairwise_gini(delays), rel=1e-12)
+
+
+@pytest.mark.parametrize("values", [[7.0], [0.0, 0.0, 5.0], [3.0, 3.0, 3.0], [0.0, 1.0, 2.0, 2.0, 90.0]])
+def test_gini_coefficient_matches_pairwise_formula_on_small_sets(values):
+    assert gini_coefficient(values) == pytest.approx(pairwise_gini(values), rel=1e-12, abs=1e-15)
+
+
+@pytest.mark.parametrize("values", [[], [0.0, 0.0, 0.0]])
+def test_gini_coefficient_undefined_like_pairwise_formula(values):
+    # Empty and all-zero delays have no Gini coefficient (nan), as before
+    assert np.isnan(pairwise_gini(values))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        assert np.isnan(gini_coefficient(values))
+    assert np.isnan(streaming_gini(values))
+
+
+def test_streaming_gini_exact_for_whole_seconds():
+    rng = np.random.default_rng(4)
+    delays = rng.integers(0, 900, size=2000).astype(float)
+    assert streaming_gini(delays) == pytest.approx(pairwise_gini(delays), rel=1e-12)
+    # Values beyond the initial histogram size grow it
+    delays = np.append(delays, [5000.0, 12000.0])
+    assert streaming_gini(delays) == pytest.approx(pairwise_gini(delays), rel=1e-12)
+
+
+def test_streaming_gini_copy_is_independent():
+    estimator = StreamingGini()
+    for value in [10.0, 20.0, 30.0]:
+        estimator.add(value)
+    copy = estimator.copy()
+    copy.add(400.0)
+    assert estimator.gini() == pytest.approx(pairwise_gini([10.0, 20.0, 30.0]), rel=1e-12)
+    assert copy.gini() == pytest.approx(pairwise_gini([10.0, 20.0, 30.0, 400.0]), rel=1e-12)
@@ -0,0 +1,157 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the SCOSCA green phase optimizer
+    (ControllerSCOSCA.optimize_green_phases, PhaseIncidence) against the
+    original per-junction loops of SCOSCA and FairSCOSCA_1, including equal
+    degrees of saturation (ties).
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import copy
+import functools
+import numpy as np
+import pytest
+from ControllerSCOSCA import optimize_green_phases, phases_per_junction
+from ControllerFairSCOSCA_1 import waiting_time_penalty
+from ControllerMaxPressure import create_signal_controllers
+from SimulationContext import SimulationContext
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def get_baseline_greentimes(prev_cycle_length, queue_lengths, degree_of_sat, cycle_length, greentimes, adaptation_factor, threshold,
+                            waiting_times=None, alpha=None):
+    # Original optimize_green_phases of SCOSCA (waiting_times None) and FairSCOSCA_1
+    for junction in greentimes.keys():
+        greens = greentimes[junction]
+        effective_cycle = cycle_length - 3*(len(greens))
+        max_lane = max(degree_of_sat[junction], key=degree_of_sat[junction].get)
+        max_queue = queue_lengths[junction][max_lane]
+        max_ds = degree_of_sat[junction][max_lane]
+        if max_queue > threshold:
+            phases_with_max_lane = [p for p, lane_list in phases_per_junction[junction].items() if max_lane in lane_list]
+            if len(phases_with_max_lane) == 1:
+                max_phase = phases_with_max_lane[0]//2
+            else:
+                max_phase = 0
+            excluded_lanes = set()
+            for p in phases_with_max_lane:
+                excluded_lanes.update(phases_per_junction[junction][p])
+            phase_ds_list = []
+            waiting_time_other_phase = []
+            for phase in range(len(greens)):
+                if phase == max_phase:
+                    continue
+                lanes = phases_per_junction[junction][phase * 2]
+                phase_lanes = [l for l in lanes if l not in excluded_lanes]
+                if phase_lanes:
+                    ds_val = max([degree_of_sat[junction].get(l, 0) for l in phase_lanes])
+                    waiting_time = max([waiting_times[junction].get(l,0) for l in phase_lanes]) if waiting_times is not None else 0
+                else:
+                    ds_val = 0
+                    waiting_time = 0
+                phase_ds_list.append((phase, ds_val))
+                waiting_time_other_phase.append((phase,waiting_time))
+            phase_ds_sorted = sorted(phase_ds_list, key=lambda x: x[1], reverse=True)
+            waiting_time_other_phase_sorted = sorted(waiting_time_other_phase, key=lambda x: x[1],reverse=True)
+            second_phase = phase_ds_sorted[0][0]
+            second_ds = phase_ds_sorted[0][1]
+            third_phase = phase_ds_sorted[1][0] if len(phase_ds_sorted) > 1 else None
+            third_ds = phase_ds_sorted[1][1] if len(phase_ds_sorted) > 1 else second_ds
+            ds_diff_max = max(0, max_ds - third_ds)
+            ds_diff_second = max(0, second_ds - third_ds)
+            if waiting_times is None:
+                greentimes[junction][max_phase] = int(min(3 * effective_cycle / 4,
+                                                        greentimes[junction][max_phase] + ds_diff_max * adaptation_factor))
+            else:
+                max_waiting = 2*waiting_times[junction][max_lane] if waiting_times[junction][max_lane] != 0 else cycle_length * 10
+                second_waiting_time = waiting_time_other_phase_sorted[0][1]
+                third_waiting_time = waiting_time_other_phase_sorted[1][1] if len(waiting_time_other_phase_sorted) > 1 else 0
+                punishment = np.exp(second_waiting_time/max_waiting) - 1
+                punishment2 = np.exp(third_waiting_time/max_waiting) - 1
+                adjust = (ds_diff_max * alpha - (1-alpha)*punishment)*adaptation_factor
+                greentimes[junction][max_phase] = int(min(3 * effective_cycle / 4,
+                                                        max(greentimes[junction][max_phase], greentimes[junction][max_phase] + adjust)))
+            remaining_time = effective_cycle - greentimes[junction][max_phase]
+            if len(greens) == 2:
+                greentimes[junction][second_phase] = remaining_time
+            elif len(greens) == 3:
+                if waiting_times is None:
+                    greentimes[junction][second_phase] = int(min(2*remaining_time/3, greentimes[junction][second_phase]+ds_diff_second*adaptation_factor))
+                else:
+                    adjust2 = (alpha* ds_diff_second- (1-alpha)*punishment2)*adaptation_factor
+                    greentimes[junction][second_phase] = int(min(2*remaining_time/3,
+                                                                 max(greentimes[junction][second_phase], greentimes[junction][second_phase]+adjust2)))
+                greentimes[junction][third_phase] = remaining_time - greentimes[junction][second_phase]
+        else:
+            scaled = [int(g * effective_cycle / prev_cycle_length[junction]) for g in greens]
+            diff = effective_cycle - sum(scaled)
+            scaled[0] += diff
+            greentimes[junction] = scaled
+        prev_cycle_length[junction] = effective_cycle
+    return greentimes
+
+
+def get_random_cycle(rng, lanes, levels):
+    # Measurements per junction and lane, DS and waiting times from few levels (many ties)
+    degree_of_sat = {junction: {lane: float(rng.choice(levels)) for lane in junction_lanes} for junction, junction_lanes in lanes.items()}
+    queue_lengths = {junction: {lane: int(rng.integers(0, 8)) for lane in junction_lanes} for junction, junction_lanes in lanes.items()}
+    waiting_times = {junction: {lane: float(rng.choice([0, 10, 25, 60])) for lane in junction_lanes} for junction, junction_lanes in lanes.items()}
+    return degree_of_sat, queue_lengths, waiting_times
+
+
+@pytest.mark.parametrize("fair", [False, True])
+@pytest.mark.parametrize("levels", [[0.0, 0.5, 1.0], list(np.linspace(0, 1.4, 50))])
+def test_green_phases_match_original_loop(fair, levels):
+    rng = np.random.default_rng(len(levels) + fair)
+    # DS lanes as in RunSimulation (detector lanes of the Max Pressure links, some without phase)
+    lanes = {c.intersection_name: list(dict.fromkeys(lane for group in c.links.values() for lane in group)) for c in create_signal_controllers()}
+    greentimes = {"intersection1": [27, 27, 27], "intersection2": [38, 6, 37], "intersection3": [38, 6, 37],
+                  "intersection4": [42, 42], "intersection5": [38, 6, 37]}
+    expected_greentimes = copy.deepcopy(greentimes)
+    ctx = SimulationContext()
+    prev_cycle_length = copy.deepcopy(ctx.prev_cycle_length)
+    cycle_length = 90
+    for cycle in range(40):
+        cycle_length = int(np.clip(cycle_length + rng.integers(-10, 11), 50, 120))
+        degree_of_sat, queue_lengths, waiting_times = get_random_cycle(rng, lanes, levels)
+        alpha = 0.5
+        if fair:
+            penalty = functools.partial(waiting_time_penalty, waiting_times, alpha)
+            greentimes = optimize_green_phases(ctx, queue_lengths, degree_of_sat, cycle_length, greentimes, 5, 2,
+                                               waiting_times=waiting_times, penalty=penalty)
+            expected_greentimes = get_baseline_greentimes(prev_cycle_length, queue_lengths, degree_of_sat, cycle_length,
+                                                          expected_greentimes, 5, 2, waiting_times=waiting_times, alpha=alpha)
+        else:
+            greentimes = optimize_green_phases(ctx, queue_lengths, degree_of_sat, cycle_length, greentimes, 5, 2)
+            expected_greentimes = get_baseline_greentimes(prev_cycle_length, queue_lengths, degree_of_sat, cycle_length,
+                                                          expected_greentimes, 5, 2)
+        assert greentimes == expected_greentimes
+        assert ctx.prev_cycle_length == prev_cycle_length
+
+
+def test_max_lanes_take_first_lane_on_ties():
+    ctx = SimulationContext()
+    degree_of_sat = {"intersection2": {"183049933#0_1": 0.5, "-38361908#1_1": 0.9, "758088375#0_1": 0.9},
+                     "intersection4": {"22889927#0_1": 0.0, "-25576697#0_0": 0.0}}
+    max_lanes = ctx.phase_incidence.max_lanes(degree_of_sat, ["intersection2", "intersection4"])
+    assert max_lanes == {junction: max(values, key=values.get) for junction, values in degree_of_sat.items()}
+    assert max_lanes == {"intersection2": "-38361908#1_1", "intersection4": "22889927#0_1"}
@@ -0,0 +1,96 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the Max Pressure link pressures
+    (ControllerMaxPressure.PressureIncidence) against the per-link loop of the
+    original determine_pressures.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import numpy as np
+import pandas as pd
+import pytest
+from ControllerMaxPressure import create_signal_controllers, PressureIncidence
+from StateEngine import EXCLUDED_EDGES
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def get_baseline_pressures(controller, df_current_status):
+    # Original determine_pressures, df_hidden_vehicles as in the original determine_current_state
+    if df_current_status is None:
+        return [0 for p in controller.links]
+    df_hidden_vehicles = df_current_status[df_current_status["lane"].str.startswith("@")].copy()
+    df_hidden_vehicles["edge"] = df_hidden_vehicles["lane"].str.replace("@","")
+    df_hidden_vehicles = df_hidden_vehicles[~df_hidden_vehicles["edge"].isin(EXCLUDED_EDGES)]
+    pressures = []
+    for link in controller.links:
+        lanes = controller.links[link]
+        df_vehicles = df_current_status[df_current_status["lane"].isin(lanes)]
+        edges = [l.split("_")[0] for l in lanes]
+        hits = df_hidden_vehicles[df_hidden_vehicles["edge"].isin(edges)]
+        if len(hits)>0:
+            df_vehicles = pd.concat((df_vehicles, hits[["veh_id", "lane", "class", "weight"]]))
+        pressure = 0
+        if len(df_vehicles)>0:
+            pressure = sum(df_vehicles["weight"])
+        if controller.multiplier is not None:
+            if link in controller.multiplier:
+                pressure *= controller.multiplier[link]
+        pressures.append(pressure)
+    return pressures
+
+
+def get_random_status(rng, controllers, n_vehicles):
+    lanes = sorted(set(lane for c in controllers for group in c.links.values() for lane in group))
+    # Lanes of the links, hidden vehicles on their edges (some excluded), and lanes of no link
+    keys = lanes + sorted(set("@"+lane.split("_")[0] for lane in lanes)) + ["other_1", "@other", ":intersection1_0_0"]
+    classes = ["car", "moc", "lwt", "hwt", "bus"]
+    return pd.DataFrame({
+        "veh_id": [f"VEH_{v}" for v in range(n_vehicles)],
+        "lane": rng.choice(keys, size=n_vehicles),
+        "class": rng.choice(classes, size=n_vehicles),
+        "weight": rng.choice([0.5, 1.0, 2.0, 3.5], size=n_vehicles),
+    })
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_pressures_match_original_loop(seed):
+    rng = np.random.default_rng(seed)
+    controllers = create_signal_controllers()
+    # Link multipliers on some links
+    controllers[1].multiplier = {0: 2.0, 4: 0.5}
+    controllers[3].multiplier = {2: 3.0}
+    incidence = PressureIncidence(controllers)
+    for n_vehicles in [1, 5, 50, 400]:
+        df_current_status = get_random_status(rng, controllers, n_vehicles)
+        link_pressures = incidence.link_pressures(df_current_status)
+        for controller in controllers:
+            controller.determine_pressures(link_pressures)
+            assert controller.pressures == pytest.approx(get_baseline_pressures(controller, df_current_status), abs=1e-12)
+
+
+def test_pressures_without_vehicles():
+    controllers = create_signal_controllers()
+    incidence = PressureIncidence(controllers)
+    link_pressures = incidence.link_pressures(None)
+    for controller in controllers:
+        controller.determine_pressures(link_pressures)
+        assert controller.pressures == get_baseline_pressures(controller, None)
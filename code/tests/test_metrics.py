@@ -0,0 +1,67 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the regression tests of the metric collection
+    (Utils.get_metrics). They run without SUMO: the subscription results are
+    held in a traci SubscriptionResults object, which is reset and refilled
+    between steps like traci does with every simulation step.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import traci
+from traci import constants as tc
+from traci.domain import SubscriptionResults
+from SimulationContext import SimulationContext
+from Utils import get_metrics
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def get_vehicle_values(route_id, distance, departure, waiting_time):
+    return {tc.VAR_LANE_ID: "-E4_1", tc.VAR_ROUTE_ID: route_id, tc.VAR_ROUTE_INDEX: 0,
+            tc.VAR_SPEED: 0.0, tc.VAR_WAITING_TIME: 0.0, tc.VAR_ACCUMULATED_WAITING_TIME: waiting_time,
+            tc.VAR_DISTANCE: distance, tc.VAR_DEPARTURE: departure, tc.VAR_TYPE: "sumo_car"}
+
+
+def test_get_metrics_counts_arrivals_of_previous_step(monkeypatch):
+    """
+    A vehicle that arrives in a step is counted with its values of the
+    previous step, although traci has cleared them in the meantime.
+    """
+    arrived = []
+    monkeypatch.setattr(traci.simulation, "getArrivedIDList", lambda: list(arrived))
+    ctx = SimulationContext()
+    ctx.route_edges.update({"route_test_side": ("-E4", "E5"), "route_test_main": ("E13", "E5")})
+    results = SubscriptionResults(None)
+    # Step 1800: both vehicles are in the network
+    results.get()["VEH_1"] = get_vehicle_values("route_test_side", 500.0, 1700.0, 40.0)
+    results.get()["VEH_2"] = get_vehicle_values("route_test_main", 800.0, 1750.0, 10.0)
+    metrics = get_metrics(ctx, 1800, results.get())
+    assert metrics[0] == 0 and metrics[-1] == 2
+    # Step 1801: traci resets the results, VEH_1 arrived
+    results.reset()
+    results.get()["VEH_2"] = get_vehicle_values("route_test_main", 810.0, 1750.0, 10.0)
+    arrived.append("VEH_1")
+    flow, distance, travel_time, delay, vehicles, delay_side, vehicles_side, delay_main, vehicles_main, density = \
+        get_metrics(ctx, 1801, results.get())
+    assert (flow, distance, travel_time) == (1, 500.0, 101.0)
+    assert (delay, vehicles, delay_side, vehicles_side, delay_main, vehicles_main) == (40.0, 1, 40.0, 1, 0, 0)
+    assert density == 1
+    assert list(ctx.arrived_delays["total"].values()) == [40.0]
@@ -0,0 +1,119 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the racing of candidates (Optimizer.py)
+    with fake per-seed results instead of simulations.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import numpy as np
+import pytest
+from scipy import stats
+import Optimizer
+from Optimizer import OptimizerState, race_candidate, compare_with_incumbent, get_racing_seed_order
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def get_noise(gini, seed):
+    return 0.01 * np.sin(seed * (1 + 7 * gini))
+
+
+def get_params(gini):
+    # The fake candidate is identified by its Gini coefficient
+    return (gini, 0, 0, 0, 0, 0, 0, 0)
+
+
+@pytest.fixture
+def fake_seeds(monkeypatch, tmp_path):
+    """
+    Replaces the simulations with results whose Gini total (cost = -gini) is
+    the candidate's Gini plus a per-seed noise, and records the seeds
+    simulated per call.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Optimizer, "RACING_LOG", str(tmp_path / "racing_log.csv"))
+    calls = []
+    def run_seeds(state, params, seeds):
+        calls.append(list(seeds))
+        return [[0]*9 + [params[0] + get_noise(params[0], seed), 0, 0] for seed in seeds]
+    monkeypatch.setattr(Optimizer, "run_seeds", run_seeds)
+    return calls
+
+
+def test_first_candidate_runs_the_rungs_to_completion(fake_seeds):
+    state = OptimizerState()
+    cost = race_candidate(state, get_params(0.3))
+    assert fake_seeds == [Optimizer.SEEDS[:4], Optimizer.SEEDS[4:8], Optimizer.SEEDS[8:]]
+    assert cost == pytest.approx(-np.mean([0.3 + get_noise(0.3, seed) for seed in Optimizer.SEEDS]))
+    assert state.incumbent == state.complete_seed_costs[0]
+    assert len(state.incumbent) == len(Optimizer.SEEDS)
+
+
+def test_worse_candidate_is_pruned_with_worst_complete_cost(fake_seeds):
+    state = OptimizerState()
+    complete_costs = [race_candidate(state, get_params(gini)) for gini in [0.35, 0.3, 0.25]]
+    incumbent = state.incumbent
+    fake_seeds.clear()
+    # Higher Gini, lower cost: significantly worse than the incumbent after the first rung
+    cost = race_candidate(state, get_params(0.5))
+    assert len(fake_seeds) == 1 and len(fake_seeds[0]) == Optimizer.RACING_RUNGS[0]
+    assert cost == pytest.approx(min(complete_costs)) and min(complete_costs) == complete_costs[0]
+    assert state.incumbent is incumbent
+    assert len(state.complete_seed_costs) == 3
+
+
+def test_better_candidate_becomes_incumbent(fake_seeds):
+    state = OptimizerState()
+    race_candidate(state, get_params(0.3))
+    fake_seeds.clear()
+    cost = race_candidate(state, get_params(0.2))
+    assert [len(seeds) for seeds in fake_seeds] == [4, 4, 12]
+    assert cost == pytest.approx(np.mean(list(state.incumbent.values())))
+    assert all(value == pytest.approx(-0.2 - get_noise(0.2, seed)) for seed, value in state.incumbent.items())
+
+
+def test_compare_with_incumbent_direction():
+    state = OptimizerState()
+    assert compare_with_incumbent(state, {41: -0.3})[0] == "CONTINUE"
+    state.incumbent = {seed: -0.3 + 0.01 * np.cos(seed) for seed in Optimizer.SEEDS}
+    worse = {seed: state.incumbent[seed] - 0.05 + 0.001 * seed for seed in Optimizer.SEEDS[:8]}
+    better = {seed: state.incumbent[seed] + 0.05 + 0.001 * seed for seed in Optimizer.SEEDS[:8]}
+    decision, p_value = compare_with_incumbent(state, worse)
+    assert decision == "PRUNE"
+    assert p_value == pytest.approx(stats.ttest_rel(list(worse.values()), [state.incumbent[seed] for seed in worse],
+                                                    alternative="less").pvalue)
+    decision, p_value = compare_with_incumbent(state, better)
+    assert decision == "CONTINUE" and p_value > 0.5
+    # Equal differences on all seeds (no variance)
+    state.incumbent = {seed: -0.25 for seed in Optimizer.SEEDS}
+    assert compare_with_incumbent(state, {seed: -0.5 for seed in Optimizer.SEEDS[:4]}) == ("PRUNE", 0.0)
+    assert compare_with_incumbent(state, {seed: -0.25 for seed in Optimizer.SEEDS[:4]}) == ("CONTINUE", 1.0)
+
+
+def test_seed_order_by_spread_of_complete_candidates():
+    state = OptimizerState()
+    assert get_racing_seed_order(state) == Optimizer.SEEDS
+    state.complete_seed_costs = [{seed: 0.0 for seed in Optimizer.SEEDS} for _ in range(3)]
+    state.complete_seed_costs[0][50] = 1.0
+    state.complete_seed_costs[1][43] = 0.1
+    order = get_racing_seed_order(state)
+    assert order[:2] == [50, 43]
+    assert sorted(order) == Optimizer.SEEDS
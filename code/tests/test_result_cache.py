@@ -0,0 +1,116 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the result cache keys (ResultCache.py):
+    the key changes with everything that affects a result, and only with it.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import shutil
+import pytest
+import RunSimulation
+import ResultCache
+from ResultCache import get_result_key, get_model_hash, get_code_hash, CODE_EXCLUDED_FILES
+from SimulationContext import SimulationContext
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+PARAMS = (41, 46.71, 6.62, 0.79, 0.24, 0.14, 0.55, 54.97, 3.68)
+
+
+@pytest.fixture
+def hashed_dirs(monkeypatch, tmp_path):
+    """
+    Copies the code and a small model to tmp_path, and hashes these instead
+    of the repository (file hashes are not cached between the keys).
+    """
+    code_dir = tmp_path / "code"
+    code_dir.mkdir()
+    for name in os.listdir(ResultCache.CODE_DIR):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(ResultCache.CODE_DIR, name), code_dir / name)
+    model_dir = tmp_path / "model"
+    (model_dir / "logs").mkdir(parents=True)
+    (model_dir / "cache").mkdir()
+    (model_dir / "Network.net.xml").write_text("<net/>")
+    (model_dir / "Spawn_Bus.csv").write_text("Route,Time\n")
+    (model_dir / "logs" / "Output.txt").write_text("Total Throughput: 1\n")
+    monkeypatch.setattr(ResultCache, "file_hashes", {})
+    monkeypatch.setattr(ResultCache, "get_model_hash", lambda: get_model_hash(str(model_dir)))
+    monkeypatch.setattr(ResultCache, "get_code_hash", lambda: get_code_hash(str(code_dir)))
+    return code_dir, model_dir
+
+
+def get_key(controller="SCOSCAFAIRV2", params=PARAMS, settings=None):
+    ResultCache.file_hashes.clear()
+    return get_result_key(controller, params, settings if settings is not None else {"duration": 9000})
+
+
+def test_key_changes_with_controller_params_only(hashed_dirs):
+    key = get_key()
+    assert get_key(params=PARAMS[:1] + (47.0,) + PARAMS[2:]) != key
+    assert get_key(params=PARAMS[:7] + (55.0,) + PARAMS[8:]) != key
+    assert get_key(params=(42,) + PARAMS[1:]) != key
+    assert get_key(controller="SCOSCA") != key
+    # alpha is not used by FairSCOSCA_2, no parameter by Max Pressure
+    assert get_key(params=PARAMS[:6] + (0.9,) + PARAMS[7:]) == key
+    assert get_key("MAX_PRESSURE", params=PARAMS) == get_key("MAX_PRESSURE", params=PARAMS[:1] + (1.0,)*8)
+
+
+def test_key_changes_with_settings(hashed_dirs):
+    assert get_key(settings={"duration": 9000}) != get_key(settings={"duration": 3600})
+
+
+def test_key_changes_with_model_files(hashed_dirs):
+    code_dir, model_dir = hashed_dirs
+    key = get_key()
+    (model_dir / "logs" / "Output.txt").write_text("Total Throughput: 2\n")
+    (model_dir / "cache" / "Result.json").write_text("{}")
+    assert get_key() == key
+    (model_dir / "Spawn_Bus.csv").write_text("Route,Time\nroute_1,2024-03-04 15:15:00\n")
+    assert get_key() != key
+
+
+def test_key_changes_with_code_except_excluded_files(hashed_dirs):
+    code_dir, model_dir = hashed_dirs
+    key = get_key()
+    for name in CODE_EXCLUDED_FILES:
+        with open(code_dir / name, "a") as f:
+            f.write("\n# driver change\n")
+    (code_dir / "notes.txt").write_text("not code")
+    assert get_key() == key
+    with open(code_dir / "Utils.py", "a") as f:
+        f.write("\n# controller change\n")
+    assert get_key() != key
+
+
+def test_cache_file_changes_with_run_settings(hashed_dirs, monkeypatch):
+    monkeypatch.setattr(RunSimulation, "RESULT_CACHE", True)
+    monkeypatch.setattr(RunSimulation, "PROFILING", False)
+    monkeypatch.setattr(RunSimulation, "WAITING_TIME_VALIDATION", None)
+    ctx = SimulationContext(controller="SCOSCA")
+    ResultCache.file_hashes.clear()
+    result_file = RunSimulation.get_result_cache_file(PARAMS, ctx)
+    monkeypatch.setattr(RunSimulation, "SIMULATION_DURATION", RunSimulation.SIMULATION_DURATION + 60)
+    assert RunSimulation.get_result_cache_file(PARAMS, ctx) != result_file
+    monkeypatch.setattr(RunSimulation, "PROFILING", True)
+    assert RunSimulation.get_result_cache_file(PARAMS, ctx) is None
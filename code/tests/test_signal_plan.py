@@ -0,0 +1,99 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the offsets of the SCOSCA signal plans
+    (SignalPlan.SignalPlanManager.apply_offset) against the if/elif table of
+    the original setup_scosca_control. TraCI calls are recorded, not sent.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import numpy as np
+import pytest
+import traci
+from SignalPlan import SignalPlanManager
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+def get_baseline_offset_calls(greens, shift):
+    # Original offset table, returns the TraCI calls, or the error printed
+    if shift == 0:
+        return [("setPhase", 0)]
+    elif shift < 3:
+        return [("setPhase", len(greens)*2-1), ("setPhaseDuration", shift)]
+    elif shift < greens[-1] + 3:
+        return [("setPhase", len(greens)*2-2), ("setPhaseDuration", shift - 3)]
+    elif shift < greens[-1] + 6:
+        return [("setPhase", len(greens)*2-3), ("setPhaseDuration", shift - greens[-1] - 3)]
+    elif shift < greens[-1] + 6 + greens[-2]:
+        return [("setPhase", len(greens)*2-4), ("setPhaseDuration", shift - greens[-1] - 6)]
+    else:
+        if len(greens)*2 > 4:
+            if shift < greens[-1]+9+greens[-2]:
+                return [("setPhase", len(greens)*2-5), ("setPhaseDuration", shift - greens[-1]-greens[-2] - 6)]
+            elif shift < greens[-1] + 9 +greens[-2]+greens[-3]:
+                return [("setPhase", len(greens)*2-6), ("setPhaseDuration", shift - greens[-1]-greens[-2] - 9)]
+            else:
+                return "ERROR1"
+        else:
+            return "ERROR2"
+
+
+@pytest.fixture
+def traci_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(traci.trafficlight, "setPhase", lambda junction, phase: calls.append(("setPhase", phase)))
+    monkeypatch.setattr(traci.trafficlight, "setPhaseDuration", lambda junction, duration: calls.append(("setPhaseDuration", duration)))
+    return calls
+
+
+@pytest.mark.parametrize("n_greens", [2, 3])
+def test_offsets_match_original_table(n_greens, traci_calls):
+    rng = np.random.default_rng(n_greens)
+    manager = SignalPlanManager()
+    manager.begin_cycle()
+    plans = [[5]*n_greens, [6, 38, 37][:n_greens], [42]*n_greens] + [list(rng.integers(5, 60, size=n_greens)) for _ in range(20)]
+    n_errors = 0
+    for greens in plans:
+        greens = [int(g) for g in greens]
+        for shift in range(0, sum(greens) + 3*len(greens) + 10):
+            traci_calls.clear()
+            phase = manager.apply_offset("intersection1", greens, shift)
+            expected = get_baseline_offset_calls(greens, shift)
+            if isinstance(expected, str):
+                # Offset beyond the cycle: the original printed an error and the uploaded plan started at phase 0
+                assert expected == ("ERROR1" if n_greens == 3 else "ERROR2")
+                assert phase is None
+                assert traci_calls == [("setPhase", 0)]
+                n_errors += 1
+            else:
+                assert traci_calls == expected
+                assert phase == expected[0][1]
+    assert n_errors == len(plans) * 10
+    assert manager.cycle["traci_calls"] > 0
+
+
+def test_offset_table_is_cached(traci_calls):
+    manager = SignalPlanManager()
+    manager.begin_cycle()
+    manager.apply_offset("intersection2", [38, 6, 37], 50)
+    manager.apply_offset("intersection3", [38, 6, 37], 20)
+    assert list(manager.offset_tables.keys()) == [(38, 6, 37)]
+    assert manager.offset_tables[(38, 6, 37)] == [3, 40, 43, 49, 52, 90]
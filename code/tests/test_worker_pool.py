@@ -0,0 +1,93 @@
+# #############################################################################
+# ####### FairSCOSCA: Fairness At Arterial Signals - Just Around The Corner
+# #######   AUTHOR:       Kevin Riehl <kriehl@ethz.ch>, Justin Weiss <juweiss@ethz.ch> 
+# #######                 Anastasios Kouvelas <kouvelas@ethz.ch>, Michail A. Makridis <mmakridis@ethz.ch>
+# #######   YEAR :        2025
+# #######   ORGANIZATION: Traffic Engineering Group (SVT), 
+# #######                 Institute for Transportation Planning and Systems,
+# #######                 ETH Zürich
+# #############################################################################
+
+"""
+    This script contains the tests of the worker pool (WorkerPool.py) with
+    jobs that do not simulate: results are returned in order, and workers are
+    replaced after a failed job and after max_jobs.
+"""
+
+
+
+
+# #############################################################################
+# ###### IMPORTS ##############################################################
+# #############################################################################
+import os
+import pytest
+from WorkerPool import SumoWorkerPool
+
+
+
+
+# #############################################################################
+# ###### TESTS ################################################################
+# #############################################################################
+
+class UnpicklableError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def fake_job(job):
+    # Fails for negative jobs, returns the job and the pid of the worker
+    if job == -2:
+        raise UnpicklableError("no restore", 2)
+    if job < 0:
+        raise ValueError(f"job {job} failed")
+    return (job, os.getpid()), {"pid": os.getpid(), "startup_mode": "start", "startup_time": 0.0, "total_time": 0.0}
+
+
+def test_map_returns_results_in_order():
+    pool = SumoWorkerPool(3, job_function=fake_job)
+    try:
+        results = pool.map(list(range(20)))
+        assert [job for job, pid in results] == list(range(20))
+        assert len(pool.timings) == 20
+    finally:
+        pool.close()
+
+
+def test_failed_job_replaces_worker():
+    pool = SumoWorkerPool(1, job_function=fake_job)
+    try:
+        (job, first_pid), = pool.map([0])
+        with pytest.raises(ValueError, match="job -1 failed"):
+            pool.map([1, -1, 2])
+        # The failing worker exited after reporting the error, the next jobs run on a new one
+        assert pool.replaced == 1
+        (job, next_pid), = pool.map([3])
+        assert next_pid != first_pid
+        with pytest.raises(RuntimeError, match="UnpicklableError: no restore"):
+            pool.map([-2])
+        assert pool.map([4])[0][0] == 4
+        assert pool.replaced == 2
+    finally:
+        pool.close()
+
+
+def test_worker_replaced_after_max_jobs():
+    pool = SumoWorkerPool(1, max_jobs=2, job_function=fake_job)
+    try:
+        pids = [pid for job, pid in pool.map(list(range(6)))]
+        assert pids[0] == pids[1] and pids[2] == pids[3] and pids[4] == pids[5]
+        assert len(set(pids)) == 3
+    finally:
+        pool.close()
+
+
+def test_submit_reports_errors_to_callback():
+    pool = SumoWorkerPool(2, job_function=fake_job)
+    done = []
+    pool.submit(5, done.append)
+    pool.submit(-3, done.append)
+    pool.close()
+    assert sorted(map(type, done), key=lambda t: t.__name__) == [ValueError, tuple]